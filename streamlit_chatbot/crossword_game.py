@@ -2,6 +2,9 @@ import streamlit as st
 import random
 import time
 
+from crossword_grid import DIRECTION_NAMES, PuzzlePool
+from word_store import WordStore
+
 # Initialize session state
 if 'coins' not in st.session_state:
     st.session_state.coins = 100  # Starting coins
@@ -13,66 +16,108 @@ if 'start_time' not in st.session_state:
     st.session_state.start_time = None
 if 'game_active' not in st.session_state:
     st.session_state.game_active = False
-word_databases = {
-    "Animals": {
-        "Easy": ["CAT", "DOG", "OWL", "BAT"],
-        "Medium": ["TIGER", "ZEBRA", "PANDA", "KOALA"],
-        "Hard": ["ELEPHANT", "KANGAROO", "RHINOCEROS"]
-    },
-    "Countries": {
-        "Easy": ["USA", "UK", "JPN", "GER"],
-        "Medium": ["BRAZIL", "CANADA", "FRANCE"],
-        "Hard": ["AUSTRALIA", "ARGENTINA", "INDONESIA"]
-    },
-    # Add more themes...
-}
+
+
+@st.cache_resource
+def get_word_store():
+    """Theme word lists shared by every session, indexed on first use"""
+    return WordStore()
+
+
+@st.cache_resource
+def get_puzzle_pool():
+    """Crossword pools shared by every session, filled in the background from startup"""
+    pool = PuzzlePool(get_word_store())
+    pool.warm(get_word_store().themes())
+    return pool
+
+
+def start_puzzle(theme, level):
+    """Take a ready grid from the pool and reveal about 30% of its letters"""
+    puzzle = get_puzzle_pool().get(theme, level)
+    st.session_state.puzzle = puzzle
+    st.session_state.puzzle_number = st.session_state.get('puzzle_number', 0) + 1
+    st.session_state.solved = set()
+    cells = list(puzzle.cells) if puzzle else []
+    st.session_state.revealed = set(random.sample(cells, max(1, int(len(cells) * 0.3)))) if cells else set()
+
+
+def grid_html(puzzle, shown):
+    """HTML table of the grid, with clue numbers and the letters in `shown`"""
+    numbers = {(entry['row'], entry['col']): entry['number'] for entry in puzzle.entries}
+    rows = []
+    for row in range(puzzle.rows):
+        cells = []
+        for col in range(puzzle.cols):
+            if (row, col) not in puzzle.cells:
+                cells.append('<td style="width:30px;height:30px;background:#333;border:1px solid #333"></td>')
+                continue
+            letter = puzzle.cells[row, col] if (row, col) in shown else ''
+            cells.append(
+                '<td style="width:30px;height:30px;border:1px solid #999;background:#fff;color:#000;'
+                'text-align:center;vertical-align:middle;font-weight:bold;position:relative;padding:0">'
+                f'<span style="position:absolute;top:0;left:2px;font-size:9px;font-weight:normal">'
+                f'{numbers.get((row, col), "")}</span>{letter}</td>'
+            )
+        rows.append(f"<tr>{''.join(cells)}</tr>")
+    return f'<table style="border-collapse:collapse">{"".join(rows)}</table>'
+
+
 def display_puzzle():
-    theme = st.session_state.current_theme
-    level = st.session_state.current_level
-    
-    # Select random word
-    word = random.choice(word_databases[theme][level])
-    word = word.upper()
-    length = len(word)
-    
-    # Determine which letters to reveal (about 30%)
-    reveal_count = max(1, int(length * 0.3))
-    reveal_positions = sorted(random.sample(range(length), reveal_count))
+    puzzle = st.session_state.puzzle
+    if puzzle is None:
+        st.warning("No words for this theme and level yet.")
+        st.session_state.game_active = False
+        return
+    solved = st.session_state.solved
     
     # Display puzzle
-    st.subheader(f"Theme: {theme} | Level: {level}")
-    st.write(f"Word length: {length} letters")
+    st.subheader(f"Theme: {puzzle.theme} | Level: {puzzle.level}")
+    shown = set(st.session_state.revealed)
+    for i in solved:
+        shown.update(puzzle.entry_cells(puzzle.entries[i]))
+    st.markdown(grid_html(puzzle, shown), unsafe_allow_html=True)
     
-    # Show revealed letters
-    cols = st.columns(length)
-    for i in range(length):
-        if i in reveal_positions:
-            cols[i].write(f"**{word[i]}**")
-        else:
-            cols[i].write("_")
-    
-    # User input
-    guess = st.text_input("Enter your guess:").upper()
+    # One answer box per word still to solve
+    guesses = {}
+    for direction in DIRECTION_NAMES:
+        st.write(f"**{direction}**")
+        for i, entry in enumerate(puzzle.entries):
+            if entry['direction'] != direction:
+                continue
+            label = f"{entry['number']}. ({len(entry['word'])} letters)"
+            if i in solved:
+                st.write(f"✅ {label} **{entry['word']}**")
+            else:
+                key = f"guess_{st.session_state.puzzle_number}_{i}"
+                guesses[i] = st.text_input(label, key=key).strip().upper()
     
-    if st.button("Submit Guess"):
-        if guess == word:
+    if st.button("Submit Guesses"):
+        correct = [i for i, guess in guesses.items() if guess == puzzle.entries[i]['word']]
+        solved.update(correct)
+        if len(solved) == len(puzzle.entries):
             time_taken = time.time() - st.session_state.start_time
-            coins_earned = calculate_reward(time_taken, level)
+            coins_earned = calculate_reward(time_taken, puzzle.level)
             st.session_state.coins += coins_earned
-            st.success(f"Correct! You earned {coins_earned} coins!")
+            st.success(f"Puzzle complete! You earned {coins_earned} coins!")
             st.session_state.game_active = False
+        elif correct:
+            st.success(f"{len(correct)} correct! Keep going.")
         else:
             st.error("Incorrect! Try again.")
     
     # Clue purchase option
     if st.session_state.coins >= 20:
         if st.button("Buy Clue (20 coins)"):
-            st.session_state.coins -= 20
             # Reveal one additional letter
-            hidden_positions = [i for i in range(length) if i not in reveal_positions]
-            if hidden_positions:
-                reveal_positions.append(random.choice(hidden_positions))
-                st.experimental_rerun()
+            hidden = [cell for cell in puzzle.cells if cell not in shown]
+            if hidden:
+                st.session_state.coins -= 20
+                st.session_state.clues_used += 1
+                st.session_state.revealed.add(random.choice(hidden))
+                st.rerun()
+
+
 def calculate_reward(time_taken, level):
     base_rewards = {"Easy": 50, "Medium": 100, "Hard": 200}
     time_bonus = max(0, (60 - time_taken) * 2)  # Bonus for speed
@@ -93,14 +138,17 @@ def main():
     st.session_state.current_level = st.sidebar.selectbox(
         "Select Level", ["Easy", "Medium", "Hard"])
     st.session_state.current_theme = st.sidebar.selectbox(
-        "Select Theme", list(word_databases.keys()))
+        "Select Theme", get_word_store().themes())
     
+    # Creating the pool starts generating puzzles for every theme and level
+    get_puzzle_pool()
     if not st.session_state.game_active:
         if st.button("Start New Puzzle"):
+            start_puzzle(st.session_state.current_theme, st.session_state.current_level)
             st.session_state.game_active = True
             st.session_state.start_time = time.time()
             st.session_state.clues_used = 0
-            st.experimental_rerun()
+            st.rerun()
     else:
         display_puzzle()
     
@@ -0,0 +1,378 @@
+import logging
+import random
+import string
+import threading
+import time
+import weakref
+from collections import deque
+
+import numpy as np
+
+from word_store import DIFFICULTIES
+
+logger = logging.getLogger(__name__)
+
+GRID_SIZE = 15
+# Words placed in a finished grid, per level
+TARGET_WORDS = {"Easy": 8, "Medium": 12, "Hard": 10}
+# Search limits: placements tried and seconds spent before settling for
+# the best grid so far, open slots sampled per step, and how many of those
+# slots, and words per slot, are tried before backtracking
+NODE_BUDGET = 400
+TIME_BUDGET = 0.25
+SLOTS_PER_STEP = 12
+SLOT_TRIES = 3
+WORDS_PER_SLOT = 4
+# Puzzles kept ready per (theme, level), and the level that triggers a refill
+POOL_SIZE = 5
+REFILL_BELOW = 3
+
+ACROSS, DOWN = 0, 1
+DIRECTION_NAMES = ("Across", "Down")
+STEPS = ((0, 1), (1, 0))
+
+
+def _bit_ids(bits):
+    """Indexes of the set bits of an int, lowest first"""
+    packed = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(packed, bitorder='little'))
+
+
+class PatternIndex:
+    """Bitsets over a theme level's words, one per (length, position, letter)
+
+    Bit i of `bits[length][position][letter]` is set when word i of that
+    length has that letter at that position, so the words matching a
+    partly filled slot are the AND of one bitset per known letter. Each
+    bitset is filled from one slice of the theme's letter-at-position
+    index, and the words themselves stay in its memory-mapped list.
+    """
+
+    # Built once per (theme, level, max length) and dropped with the theme
+    _built = weakref.WeakKeyDictionary()
+    _lock = threading.Lock()
+
+    def __init__(self, theme_words, difficulty, max_length=GRID_SIZE):
+        # Only the word array is kept, so a cached index never pins its ThemeWords
+        self.words = theme_words.words
+        self.first = {}
+        self.counts = {}
+        self.bits = {}
+        for length in theme_words.lengths(difficulty):
+            if length > max_length:
+                continue
+            ids = theme_words.candidates(difficulty, length)
+            self.first[length], self.counts[length] = int(ids[0]), len(ids)
+            self.bits[length] = [self._position_bits(theme_words, difficulty, length, position)
+                                 for position in range(length)]
+
+    def _position_bits(self, theme_words, difficulty, length, position):
+        bits = {}
+        for letter in string.ascii_uppercase:
+            ids = theme_words.candidates(difficulty, length, {position: letter})
+            if len(ids):
+                column = np.zeros(self.counts[length], dtype=bool)
+                column[ids - self.first[length]] = True
+                bits[letter] = int.from_bytes(np.packbits(column, bitorder='little').tobytes(), 'little')
+        return bits
+
+    @classmethod
+    def from_theme(cls, theme_words, difficulty, max_length=GRID_SIZE):
+        """Return the index of a theme's difficulty level, building it on first use"""
+        with cls._lock:
+            built = cls._built.setdefault(theme_words, {})
+            key = (difficulty, max_length)
+            if key not in built:
+                built[key] = cls(theme_words, difficulty, max_length)
+            return built[key]
+
+    @property
+    def lengths(self):
+        return sorted(self.counts)
+
+    def word(self, length, word_id):
+        """The word with bit `word_id` among the words of `length`"""
+        return self.words[self.first[length] + word_id].decode('ascii')
+
+    def matches(self, length, pattern):
+        """Bitset of the words of `length` matching a {position: letter} pattern"""
+        if length not in self.bits:
+            return 0
+        matched = (1 << self.counts[length]) - 1
+        for position, letter in pattern.items():
+            matched &= self.bits[length][position].get(letter, 0)
+            if not matched:
+                break
+        return matched
+
+
+class Crossword:
+    """A finished grid, cropped to its words and numbered like a printed crossword
+
+    `cells` maps (row, col) to a letter. Each entry is a dict with the
+    clue number, direction name, starting row and col, and the word.
+    """
+
+    __slots__ = ('theme', 'level', 'rows', 'cols', 'cells', 'entries')
+
+    def __init__(self, theme, level, placements):
+        cells = {}
+        for word, row, col, direction in placements:
+            step_row, step_col = STEPS[direction]
+            for i, letter in enumerate(word):
+                cells[row + i * step_row, col + i * step_col] = letter
+        top = min(row for row, _ in cells)
+        left = min(col for _, col in cells)
+        self.theme = theme
+        self.level = level
+        self.cells = {(row - top, col - left): letter for (row, col), letter in cells.items()}
+        self.rows = max(row for row, _ in self.cells) + 1
+        self.cols = max(col for _, col in self.cells) + 1
+        starts = sorted({(row - top, col - left) for _, row, col, _ in placements})
+        numbers = {start: number for number, start in enumerate(starts, 1)}
+        self.entries = sorted(
+            ({'number': numbers[row - top, col - left], 'direction': DIRECTION_NAMES[direction],
+              'row': row - top, 'col': col - left, 'word': word}
+             for word, row, col, direction in placements),
+            key=lambda entry: (entry['direction'], entry['number'])
+        )
+
+    def entry_cells(self, entry):
+        """Grid cells covered by one entry"""
+        step_row, step_col = STEPS[DIRECTION_NAMES.index(entry['direction'])]
+        return [(entry['row'] + i * step_row, entry['col'] + i * step_col) for i in range(len(entry['word']))]
+
+
+class _Search:
+    """Backtracking state for one grid: letters, word directions per cell, used words"""
+
+    def __init__(self, index, size, target, rng, budget, deadline):
+        self.index = index
+        self.size = size
+        self.target = target
+        self.rng = rng
+        self.budget = budget
+        self.deadline = deadline
+        self.letters = [[None] * size for _ in range(size)]
+        # Bit per direction of the words running through each cell
+        self.directions = [[0] * size for _ in range(size)]
+        self.used = {length: 0 for length in index.lengths}
+        self.placements = []
+        self.best = []
+
+    def empty(self, row, col):
+        return not (0 <= row < self.size and 0 <= col < self.size) or self.letters[row][col] is None
+
+    def place(self, word, row, col, direction, word_bit):
+        step_row, step_col = STEPS[direction]
+        filled = []
+        for i, letter in enumerate(word):
+            r, c = row + i * step_row, col + i * step_col
+            if self.letters[r][c] is None:
+                self.letters[r][c] = letter
+                filled.append((r, c))
+            self.directions[r][c] |= 1 << direction
+        self.used[len(word)] |= word_bit
+        self.placements.append((word, row, col, direction))
+        return filled
+
+    def remove(self, filled, word_bit):
+        word, row, col, direction = self.placements.pop()
+        step_row, step_col = STEPS[direction]
+        for i in range(len(word)):
+            self.directions[row + i * step_row][col + i * step_col] &= ~(1 << direction)
+        for r, c in filled:
+            self.letters[r][c] = None
+        self.used[len(word)] &= ~word_bit
+
+    def _allowed(self, row, col, direction):
+        """Whether a word running in `direction` may cover this cell
+
+        A letter may be crossed if no word runs through it that way yet;
+        an empty cell may take a new letter only if it has no side
+        neighbours, so no stray words form.
+        """
+        if not (0 <= row < self.size and 0 <= col < self.size):
+            return False
+        if self.letters[row][col] is not None:
+            return not self.directions[row][col] & (1 << direction)
+        step_row, step_col = STEPS[direction]
+        return self.empty(row + step_col, col + step_row) and self.empty(row - step_col, col - step_row)
+
+    def _window(self, row, col, direction):
+        """The run of cells through (row, col) a word in `direction` may use
+
+        Returns the run's letters (None for empty cells), the anchor's
+        position in it, and whether a letter sits just before and just
+        after the run.
+        """
+        step_row, step_col = STEPS[direction]
+        before = 0
+        while self._allowed(row - (before + 1) * step_row, col - (before + 1) * step_col, direction):
+            before += 1
+        after = 0
+        while self._allowed(row + (after + 1) * step_row, col + (after + 1) * step_col, direction):
+            after += 1
+        first_row, first_col = row - before * step_row, col - before * step_col
+        cells = [self.letters[first_row + i * step_row][first_col + i * step_col] for i in range(before + after + 1)]
+        last_row, last_col = row + after * step_row, col + after * step_col
+        blocked = (not self.empty(first_row - step_row, first_col - step_col),
+                   not self.empty(last_row + step_row, last_col + step_col))
+        return cells, before, blocked
+
+    def open_slots(self):
+        """Sample open slots crossing the grid, most crossings first
+
+        Anchors are placed letters with a free perpendicular direction,
+        taken in random order until SLOTS_PER_STEP slots with matching
+        words are found. A slot must lie in its anchor's window, must not
+        run on from or into another letter, and must add at least one.
+        """
+        anchors = []
+        for word, row, col, direction in self.placements:
+            step_row, step_col = STEPS[direction]
+            anchors += [(row + i * step_row, col + i * step_col, 1 - direction) for i in range(len(word))]
+        self.rng.shuffle(anchors)
+        slots = {}
+        for row, col, direction in anchors:
+            if self.directions[row][col] & (1 << direction):
+                continue
+            cells, anchor, (blocked_before, blocked_after) = self._window(row, col, direction)
+            step_row, step_col = STEPS[direction]
+            for length in self.rng.sample(self.index.lengths, len(self.index.lengths)):
+                for start in range(max(0, anchor - length + 1), min(anchor, len(cells) - length) + 1):
+                    end = start + length
+                    if cells[start - 1] is not None if start else blocked_before:
+                        continue
+                    if cells[end] is not None if end < len(cells) else blocked_after:
+                        continue
+                    key = (row + (start - anchor) * step_row, col + (start - anchor) * step_col, direction, length)
+                    if key in slots:
+                        continue
+                    pattern = {i: letter for i, letter in enumerate(cells[start:end]) if letter is not None}
+                    if len(pattern) == length:
+                        continue
+                    matches = self.index.matches(length, pattern) & ~self.used[length]
+                    if matches:
+                        slots[key] = (pattern, matches)
+            if len(slots) >= SLOTS_PER_STEP:
+                break
+        return sorted(slots.items(), key=lambda item: -len(item[1][0]))
+
+    def exhausted(self):
+        return self.budget <= 0 or time.monotonic() > self.deadline
+
+    def run(self):
+        """Depth-first placement; True once the target is met or the search is out of budget"""
+        if len(self.placements) > len(self.best):
+            self.best = list(self.placements)
+        if len(self.placements) >= self.target or self.exhausted():
+            return True
+        for (row, col, direction, length), (_, matches) in self.open_slots()[:SLOT_TRIES]:
+            ids = _bit_ids(matches)
+            for pick in self.rng.sample(range(len(ids)), min(WORDS_PER_SLOT, len(ids))):
+                self.budget -= 1
+                word_id = int(ids[pick])
+                word_bit = 1 << word_id
+                filled = self.place(self.index.word(length, word_id), row, col, direction, word_bit)
+                if self.run():
+                    return True
+                self.remove(filled, word_bit)
+                if self.exhausted():
+                    return True
+        return False
+
+
+def generate_crossword(theme_words, theme, level, size=GRID_SIZE, target=None, rng=random):
+    """Build an interlocking crossword from a theme's words at one level
+
+    The first word is laid across the middle of the grid, then each step
+    places a word through letters already on the grid. Open slots are
+    found from the placed letters, the pattern index gives each slot's
+    matching words in one AND per crossing letter, and a dead end undoes
+    the last word and tries another. The search stops at `target` words
+    (TARGET_WORDS for the level by default), or after NODE_BUDGET
+    placements or TIME_BUDGET seconds, returning the largest grid
+    reached. Returns None when the level has no words that fit.
+    """
+    index = PatternIndex.from_theme(theme_words, level, max_length=size)
+    if not index.counts:
+        return None
+    target = target or TARGET_WORDS[level]
+    deadline = time.monotonic() + TIME_BUDGET
+    best = []
+    # A handful of different opening words, in case one leads nowhere
+    for _ in range(3):
+        search = _Search(index, size, target, rng, NODE_BUDGET, deadline)
+        length = rng.choice([length for length in index.lengths if length >= 3] or index.lengths)
+        word_id = rng.randrange(index.counts[length])
+        search.place(index.word(length, word_id), size // 2, (size - length) // 2, ACROSS, 1 << word_id)
+        search.run()
+        if len(search.best) > len(best):
+            best = search.best
+        if len(best) >= target or time.monotonic() > deadline:
+            break
+    return Crossword(theme, level, best)
+
+
+class PuzzlePool:
+    """Pre-generated crosswords per (theme, level), shared by every session
+
+    A background worker keeps each (theme, level) topped up, so `get` is
+    normally a pop from memory. A pool that has run dry generates one
+    grid inline, which stays well under a second.
+    """
+
+    def __init__(self, store, size=POOL_SIZE, refill_below=REFILL_BELOW):
+        self.store = store
+        self.size = size
+        self.refill_below = refill_below
+        self._puzzles = {}
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        threading.Thread(target=self._refill_loop, name='crossword-pool', daemon=True).start()
+
+    def warm(self, themes, levels=DIFFICULTIES):
+        """Start filling the pools for every theme and level"""
+        with self._lock:
+            for theme in themes:
+                for level in levels:
+                    self._puzzles.setdefault((theme, level), deque())
+        self._wanted.set()
+
+    def _generate(self, theme, level):
+        started = time.monotonic()
+        puzzle = generate_crossword(self.store.theme(theme), theme, level)
+        logger.debug("Generated %s/%s crossword in %.3fs", theme, level, time.monotonic() - started)
+        return puzzle
+
+    def _refill_loop(self):
+        while True:
+            self._wanted.wait()
+            self._wanted.clear()
+            with self._lock:
+                keys = list(self._puzzles)
+            for key in keys:
+                while len(self._puzzles[key]) < self.size:
+                    try:
+                        puzzle = self._generate(*key)
+                    except (OSError, ValueError) as error:
+                        logger.warning("Generating %s/%s crosswords failed: %s", *key, error)
+                        break
+                    if puzzle is None:
+                        break
+                    with self._lock:
+                        self._puzzles[key].append(puzzle)
+
+    def get(self, theme, level):
+        """Return a Crossword for a theme and level, or None if it has no words"""
+        with self._lock:
+            puzzles = self._puzzles.setdefault((theme, level), deque())
+            puzzle = puzzles.popleft() if puzzles else None
+            if len(puzzles) < self.refill_below:
+                self._wanted.set()
+        return puzzle if puzzle is not None else self._generate(theme, level)
+
+    def available(self, theme, level):
+        """Number of puzzles ready to serve for a theme and level"""
+        return len(self._puzzles.get((theme, level), ()))
@@ -0,0 +1,329 @@
+import bisect
+import logging
+import math
+import os
+import re
+import sys
+import uuid
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from mood_store import MOOD_CODES, MOOD_EMOJIS
+from mood_segments import SEGMENT_DIR, BlobFile
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+# Title words count for more than body words when ranking
+TITLE_WEIGHT = 3
+# zlib level for diary bodies, in memory and on disk
+CONTENT_COMPRESSION = 6
+# Approximate in-memory bytes, for memory accounting: per stored entry
+# besides its body and title (the entry object and its place in the date
+# order), and in the search index per (term, entry) posting, per distinct
+# term, and per indexed entry
+ENTRY_BYTES = 250
+POSTING_BYTES = 34
+TERM_BYTES = 250
+INDEXED_ENTRY_BYTES = 100
+# Once the entries and index alone outgrow a store's memory limit, bodies
+# gather in memory up to this many bytes and then go to disk together
+OVERFLOW_SPILL_BYTES = 256 * 1024
+
+
+def tokenize(text):
+    """Split text into lowercase search terms"""
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class DiaryEntry:
+    """One diary entry, stored compactly
+
+    The timestamp is kept as int64 epoch minutes and the mood as a small
+    code into MOOD_EMOJIS (-1 for none); date and time strings are only
+    produced when an entry is displayed. The body is held zlib-compressed
+    and only decompressed when `content` is read; a body that a DiaryStore
+    has spilled to disk is read back first.
+    """
+
+    __slots__ = ('id', 'minute', 'title', '_content', '_spilled', 'mood_code', 'word_count')
+
+    def __init__(self, entry_id, timestamp, title, content, mood=None, word_count=None):
+        self.id = entry_id
+        self.minute = int(np.datetime64(pd.Timestamp(timestamp), 'm').astype(np.int64))
+        self.title = title
+        self._content = zlib.compress(content.encode('utf-8'), CONTENT_COMPRESSION) if content else b''
+        # (BlobFile, offset, length) once the content has spilled to disk
+        self._spilled = None
+        self.mood_code = MOOD_CODES[mood] if mood else -1
+        if word_count is None:
+            word_count = len(content.split()) if content else 0
+        self.word_count = word_count
+
+    @property
+    def content(self):
+        data = self._content
+        if self._spilled is not None:
+            blob, offset, length = self._spilled
+            data = blob.read(offset, length)
+        return zlib.decompress(data).decode('utf-8') if data else ''
+
+    @property
+    def content_bytes(self):
+        """Memory held by the compressed body while it is in memory"""
+        return 0 if self._spilled is not None else sys.getsizeof(self._content)
+
+    @property
+    def timestamp(self):
+        return np.datetime64(self.minute, 'm')
+
+    @property
+    def mood(self):
+        return MOOD_EMOJIS[self.mood_code] if self.mood_code >= 0 else None
+
+    @property
+    def date(self):
+        return pd.Timestamp(self.timestamp).strftime('%Y-%m-%d')
+
+    @property
+    def time(self):
+        return pd.Timestamp(self.timestamp).strftime('%H:%M')
+
+
+class DiarySearchIndex:
+    """Inverted index over diary titles and content
+
+    Maps each term to the entries containing it, with a per-entry weight,
+    and keeps the vocabulary sorted so prefix queries are a binary search.
+    Entries are added and removed incrementally, so searching never rescans
+    the text of every entry.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._terms = []
+        self._entries = {}
+        self._moods = {}
+        self._posting_count = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def memory_usage(self):
+        """Approximate bytes held by the postings, vocabulary and entry lookups"""
+        return (self._posting_count * POSTING_BYTES + len(self._terms) * TERM_BYTES
+                + len(self._entries) * INDEXED_ENTRY_BYTES)
+
+    def add(self, entry):
+        """Index one diary entry"""
+        weights = {}
+        for term in tokenize(entry.title):
+            weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+        for term in tokenize(entry.content):
+            weights[term] = weights.get(term, 0) + 1
+        for term, weight in weights.items():
+            if term not in self._postings:
+                self._postings[term] = {}
+                bisect.insort(self._terms, term)
+            self._postings[term][entry.id] = weight
+        self._posting_count += len(weights)
+        self._entries[entry.id] = entry
+        self._moods.setdefault(entry.mood_code, set()).add(entry.id)
+
+    def remove(self, entry):
+        """Drop one diary entry from the index"""
+        entry_id = entry.id
+        terms = set(tokenize(entry.title)) | set(tokenize(entry.content))
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            if postings.pop(entry_id, None) is not None:
+                self._posting_count -= 1
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+        self._entries.pop(entry_id, None)
+        self._moods.get(entry.mood_code, set()).discard(entry_id)
+
+    def _matches(self, term):
+        """Return {entry_id: weight} for a term, or a prefix query ending in '*'"""
+        if not term.endswith('*'):
+            return self._postings.get(term, {})
+        prefix = term[:-1]
+        matches = {}
+        start = bisect.bisect_left(self._terms, prefix)
+        for vocab_term in self._terms[start:]:
+            if not vocab_term.startswith(prefix):
+                break
+            for entry_id, weight in self._postings[vocab_term].items():
+                matches[entry_id] = matches.get(entry_id, 0) + weight
+        return matches
+
+    def search(self, query, moods=None, limit=50, offset=0):
+        """Return (page of matching entries, total number of matches)
+
+        Entries must match every query term and come best match first, or
+        newest first for a mood filter alone; the page holds `limit` of
+        them from `offset`. Terms ending in '*' match as prefixes. `moods`
+        limits results to entries tagged with one of the given mood emojis.
+        """
+        terms = [term + '*' if raw.endswith('*') else term
+                 for raw in query.lower().split() for term in tokenize(raw)]
+        allowed = None
+        if moods:
+            allowed = set().union(*(self._moods.get(MOOD_CODES[mood], set()) for mood in moods))
+
+        if not terms:
+            ids = allowed if allowed is not None else self._entries.keys()
+            entries = [self._entries[entry_id] for entry_id in ids]
+            entries.sort(key=lambda entry: (entry.minute, entry.id), reverse=True)
+            return entries[offset:offset + limit], len(entries)
+
+        scores = None
+        total = len(self._entries)
+        for term in terms:
+            matches = self._matches(term)
+            idf = math.log(1 + total / len(matches)) if matches else 0
+            if scores is None:
+                scores = {entry_id: weight * idf for entry_id, weight in matches.items()
+                          if allowed is None or entry_id in allowed}
+            else:
+                scores = {entry_id: score + matches[entry_id] * idf
+                          for entry_id, score in scores.items() if entry_id in matches}
+            if not scores:
+                return [], 0
+        ranked = sorted(scores, key=scores.get, reverse=True)[offset:offset + limit]
+        return [self._entries[entry_id] for entry_id in ranked], len(scores)
+
+
+class DiaryStore:
+    """Diary entries keyed by stable id and kept in date order
+
+    A sorted list of (timestamp, id) keys gives the display order without
+    re-sorting on every render, and entries are found for deletion by id
+    plus a binary search instead of comparing whole dicts.
+
+    A `search_index` given here is kept in step with the store: entries
+    are indexed as they are added and dropped from it as they are removed.
+
+    With a `memory_limit` (bytes), the entries themselves (titles, dates,
+    moods, word counts) and the search index always stay in memory and
+    count against it. Once they plus the bodies held in memory exceed the
+    limit, the bodies of the oldest entries spill to an on-disk BlobFile
+    until the bodies use half of what the resident data leaves free. If
+    the resident data alone outgrows the limit, `over_limit` turns True,
+    a warning is logged, and bodies go to disk in OVERFLOW_SPILL_BYTES
+    batches. Spilling resumes from the first key not yet spilled, so each
+    body is visited once however many batches go out.
+    """
+
+    def __init__(self, entries=(), memory_limit=None, segment_dir=SEGMENT_DIR, search_index=None):
+        self._entries = {}
+        self._keys = []
+        self.memory_limit = memory_limit
+        self.search_index = search_index
+        self.over_limit = False
+        self._segment_dir = segment_dir
+        self._blob = None
+        self._content_bytes = 0
+        self._title_bytes = 0
+        # Keys before this position have spilled, except the back-dated
+        # entries added behind it since, which wait in _behind
+        self._spill_from = 0
+        self._behind = []
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __bool__(self):
+        return bool(self._entries)
+
+    def __iter__(self):
+        """Iterate over entries, newest first"""
+        for key in reversed(self._keys):
+            yield self._entries[key[1]]
+
+    @staticmethod
+    def _key(entry):
+        return (entry.minute, entry.id)
+
+    def resident_bytes(self):
+        """Approximate bytes held by the entries besides their bodies, and by the search index"""
+        index_bytes = self.search_index.memory_usage() if self.search_index is not None else 0
+        return len(self._entries) * ENTRY_BYTES + self._title_bytes + index_bytes
+
+    def memory_usage(self):
+        """Approximate bytes held in memory by bodies, entries and the search index"""
+        return self._content_bytes + self.resident_bytes()
+
+    def add(self, entry):
+        """Insert an entry at its place in date order"""
+        self._entries[entry.id] = entry
+        key = self._key(entry)
+        position = bisect.bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        if position < self._spill_from:
+            self._spill_from += 1
+            if entry._spilled is None:
+                self._behind.append(entry)
+        self._content_bytes += entry.content_bytes
+        self._title_bytes += sys.getsizeof(entry.title)
+        if self.search_index is not None:
+            self.search_index.add(entry)
+        self._enforce_limit()
+
+    def _enforce_limit(self):
+        if self.memory_limit is None or not self._content_bytes:
+            return
+        free = self.memory_limit - self.resident_bytes()
+        if free <= 0 and not self.over_limit:
+            logger.warning("Diary entries and search index use %.1f MB, over the %.1f MB session limit; "
+                           "keeping entry bodies on disk", self.resident_bytes() / 2 ** 20,
+                           self.memory_limit / 2 ** 20)
+        self.over_limit = free <= 0
+        if self.over_limit:
+            if self._content_bytes >= OVERFLOW_SPILL_BYTES:
+                self._spill(self._content_bytes)
+        elif self._content_bytes > free:
+            self._spill(self._content_bytes - free // 2)
+
+    def _spill(self, needed):
+        """Move the content of the oldest in-memory entries to disk until `needed` bytes are freed"""
+        if self._blob is None:
+            self._blob = BlobFile(os.path.join(self._segment_dir, f'{uuid.uuid4().hex}.diary'))
+        spilled, freed = self._behind, sum(entry.content_bytes for entry in self._behind)
+        self._behind = []
+        while freed < needed and self._spill_from < len(self._keys):
+            entry = self._entries[self._keys[self._spill_from][1]]
+            self._spill_from += 1
+            if entry._spilled is None:
+                spilled.append(entry)
+                freed += entry.content_bytes
+        compressed = [entry._content for entry in spilled]
+        for entry, offset, data in zip(spilled, self._blob.append(compressed).tolist(), compressed):
+            entry._spilled = (self._blob, offset, len(data))
+            entry._content = None
+        self._content_bytes -= freed
+
+    def get(self, entry_id):
+        return self._entries[entry_id]
+
+    def remove(self, entry_id):
+        """Remove an entry by id and return it"""
+        entry = self._entries.pop(entry_id)
+        position = bisect.bisect_left(self._keys, self._key(entry))
+        del self._keys[position]
+        if position < self._spill_from:
+            self._spill_from -= 1
+            if entry._spilled is None:
+                self._behind.remove(entry)
+        self._content_bytes -= entry.content_bytes
+        self._title_bytes -= sys.getsizeof(entry.title)
+        if self.search_index is not None:
+            self.search_index.remove(entry)
+        return entry
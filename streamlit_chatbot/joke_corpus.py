@@ -0,0 +1,39 @@
+import random
+
+# Bundled jokes served while JokeAPI is unavailable, indexed by the same
+# category keys the API uses. "any" draws from every category.
+LOCAL_JOKES = {
+    "programming": [
+        ("Why do programmers prefer dark mode?", "Because light attracts bugs."),
+        ("How many programmers does it take to change a light bulb?", "None, that's a hardware problem."),
+        ("Why did the developer go broke?", "Because they used up all their cache."),
+        ("What's a programmer's favourite place to hang out?", "Foo Bar."),
+        ("Why do Java developers wear glasses?", "Because they don't C#."),
+        ("I told my computer I needed a break.", "It said: 'No problem, I'll go to sleep.'"),
+        ("Why was the function feeling sad?", "It didn't get a callback."),
+        ("A SQL query walks into a bar, walks up to two tables and asks...", "'Can I join you?'"),
+        ("Why did the programmer quit their job?", "Because they didn't get arrays."),
+        ("There are 10 types of people in the world.", "Those who understand binary and those who don't."),
+        ("Why couldn't we load a joke?", "Because the internet is telling its own jokes!"),
+        ("Debugging is like being the detective in a crime movie where you are also the murderer.", None),
+    ],
+    "pun": [
+        ("I'm reading a book about anti-gravity.", "It's impossible to put down."),
+        ("Why don't skeletons fight each other?", "They don't have the guts."),
+        ("What do you call a fake noodle?", "An impasta."),
+        ("I used to be a baker,", "but I couldn't make enough dough."),
+        ("Why did the scarecrow win an award?", "Because he was outstanding in his field."),
+        ("What do you call a bear with no teeth?", "A gummy bear."),
+        ("I would tell you a joke about construction,", "but I'm still working on it."),
+        ("Why did the bicycle fall over?", "Because it was two tired."),
+        ("What did the ocean say to the beach?", "Nothing, it just waved."),
+        ("Why did the joke fail?", "Because the API needed a break!"),
+        ("I'm on a seafood diet. I see food and I eat it.", None),
+    ],
+}
+LOCAL_JOKES["any"] = [joke for jokes in list(LOCAL_JOKES.values()) for joke in jokes]
+
+
+def local_joke(category):
+    """Return a random bundled (setup, punchline or None) for a category"""
+    return random.choice(LOCAL_JOKES.get(category, LOCAL_JOKES["any"]))
@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from joke_corpus import local_joke
+
+logger = logging.getLogger(__name__)
+
+# Upstream joke endpoint; point it at a local stand-in server for tests
+# and benchmarks
+JOKE_API_URL = os.environ.get("LAUGH_BOX_JOKE_API", "https://v2.jokeapi.dev/joke")
+REQUEST_TIMEOUT = 3
+# Jokes kept ready per category, and the level that triggers a refill
+BUFFER_SIZE = 10
+REFILL_BELOW = 5
+
+
+def parse_joke(data):
+    """Turn one JokeAPI joke object into (setup, punchline or None)"""
+    if data["type"] == "twopart":
+        return data["setup"], data["delivery"]
+    return data["joke"], None
+
+
+class CircuitBreaker:
+    """Stops calling a failing upstream and probes it with exponential backoff
+
+    Each call is recorded with its outcome and latency, and a call slower
+    than `slow_call` seconds counts as a failure. After `threshold`
+    failures in a row, or a failure rate of `failure_rate` over the last
+    `window` calls, the circuit opens. While it is open, `closed` is False
+    and `allow` admits a single probe once `backoff` seconds have passed.
+    Each failed probe doubles the wait, up to `max_backoff`, and a
+    successful probe closes the circuit.
+    """
+
+    def __init__(self, threshold=3, window=20, failure_rate=0.5, slow_call=1.5,
+                 backoff=1.0, max_backoff=60.0):
+        self.threshold = threshold
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.base_backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self._failures_in_row = 0
+        self._backoff = backoff
+        self._retry_at = None
+        self._probing = False
+
+    @property
+    def closed(self):
+        return self._retry_at is None
+
+    def allow(self):
+        """Return True if a call may go upstream now, claiming the probe when due"""
+        with self._lock:
+            if self._retry_at is None:
+                return True
+            if self._probing or time.monotonic() < self._retry_at:
+                return False
+            self._probing = True
+            return True
+
+    def retry_in(self):
+        """Seconds until the next probe is due, or None while closed"""
+        if self._retry_at is None:
+            return None
+        return max(0.0, self._retry_at - time.monotonic())
+
+    def record(self, ok, latency):
+        """Record one upstream call"""
+        failed = not ok or latency > self.slow_call
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                if failed:
+                    self._backoff = min(self._backoff * 2, self.max_backoff)
+                    self._retry_at = time.monotonic() + self._backoff
+                else:
+                    self._close()
+                return
+            if self._retry_at is not None:
+                return
+            self._recent.append(failed)
+            self._failures_in_row = self._failures_in_row + 1 if failed else 0
+            # Judge the rate only once half the window has been seen
+            rate_tripped = (len(self._recent) * 2 >= self._recent.maxlen
+                            and sum(self._recent) >= self.failure_rate * len(self._recent))
+            if self._failures_in_row >= self.threshold or rate_tripped:
+                self._backoff = self.base_backoff
+                self._retry_at = time.monotonic() + self._backoff
+                logger.warning("Joke API circuit opened after repeated failures")
+
+    def _close(self):
+        self._retry_at = None
+        self._backoff = self.base_backoff
+        self._failures_in_row = 0
+        self._recent.clear()
+        logger.info("Joke API circuit closed")
+
+
+class JokeBuffer:
+    """Per-category buffer of prefetched jokes, shared by every session
+
+    A background worker keeps each category topped up with batched
+    requests over one pooled HTTP session, so `get` is normally a pop from
+    memory. When a buffer has run dry, or the API is down, `get` serves a
+    joke from the bundled local corpus instead. The worker calls the API
+    through a circuit breaker, so during an outage it stops fetching and
+    only wakes to probe when the breaker says a probe is due.
+    """
+
+    def __init__(self, categories, base_url=JOKE_API_URL, size=BUFFER_SIZE,
+                 refill_below=REFILL_BELOW, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.size = size
+        self.refill_below = refill_below
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+        self.session = requests.Session()
+        # Connections are kept alive and reused, so only the first request
+        # pays DNS, TCP and TLS setup
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._jokes = {category: deque() for category in categories}
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._wanted.set()
+        threading.Thread(target=self._refill_loop, name='joke-prefetch', daemon=True).start()
+
+    def fetch(self, category, amount=1):
+        """Request `amount` jokes from the upstream API; raises on failure"""
+        started = time.monotonic()
+        try:
+            response = self.session.get(f"{self.base_url}/{category}",
+                                        params={'amount': amount} if amount > 1 else None,
+                                        timeout=self.timeout)
+            data = response.json()
+            if data.get("error", False):
+                raise ValueError(data.get("message", "joke API error"))
+            jokes = [parse_joke(joke) for joke in data.get("jokes", [data])]
+        except (requests.RequestException, ValueError, KeyError):
+            self.breaker.record(False, time.monotonic() - started)
+            raise
+        self.breaker.record(True, time.monotonic() - started)
+        return jokes
+
+    def _refill_loop(self):
+        while True:
+            # Sleeps until a get() asks for more, or until the next probe is due
+            self._wanted.wait(self.breaker.retry_in())
+            self._wanted.clear()
+            for category, jokes in self._jokes.items():
+                missing = self.size - len(jokes)
+                if missing <= self.size - self.refill_below:
+                    continue
+                if not self.breaker.allow():
+                    break
+                try:
+                    fetched = self.fetch(category, missing)
+                except (requests.RequestException, ValueError, KeyError) as error:
+                    # The breaker decides when to try again
+                    logger.warning("Prefetching %s jokes failed: %s", category, error)
+                    continue
+                with self._lock:
+                    jokes.extend(fetched)
+
+    def get(self, category):
+        """Return (setup, punchline or None) for a category"""
+        with self._lock:
+            joke = self._jokes[category].popleft() if self._jokes[category] else None
+            if len(self._jokes[category]) < self.refill_below:
+                self._wanted.set()
+        # A click never waits on the network; an empty buffer falls back
+        # to the bundled corpus while the worker refills it
+        return joke if joke is not None else local_joke(category)
+
+    def available(self, category):
+        """Number of jokes ready to serve for a category"""
+        return len(self._jokes[category])
@@ -1,7 +1,8 @@
 import streamlit as st
-import requests
 import time
 
+from joke_source import JokeBuffer
+
 # ===== THEME SYSTEM =====
 THEMES = {
     "🤡 Circus": {
@@ -74,42 +75,71 @@ delivery_style = st.radio(
     horizontal=True
 )
 
-# Joke fetching function
+# Joke fetching, served from a prefetch buffer shared by all sessions
+@st.cache_resource
+def get_joke_buffer():
+    return JokeBuffer(CATEGORIES.values())
+
 def get_joke():
-    url = f"https://v2.jokeapi.dev/joke/{CATEGORIES[category]}"
-    try:
-        response = requests.get(url, timeout=3)
-        data = response.json()
-        if data.get("error", False):
-            return "Why did the joke fail?", "Because the API needed a break!"
-        if data["type"] == "twopart":
-            return data["setup"], data["delivery"]
-        return data["joke"], None
-    except:
-        return "Why couldn't we load a joke?", "Because the internet is telling its own jokes!"
+    return get_joke_buffer().get(CATEGORIES[category])
+
+# Seconds after the click at which a dramatic setup and punchline appear
+DRAMATIC_SETUP_DELAY = 2
+DRAMATIC_PUNCHLINE_DELAY = 3
+
+def show_joke(setup, punchline):
+    with st.container():
+        st.markdown('<div class="joke-box">', unsafe_allow_html=True)
+        st.write(f"**{setup}**")
+        if punchline:
+            st.write(f"*{punchline}*")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+def celebrate():
+    # Theme-specific celebration
+    if "Circus" in current_theme:
+        st.balloons()
+    elif "Dragon" in current_theme:
+        st.snow()
+
+# The browser re-runs just this fragment on a timer and each run draws the
+# stage that is due, so the pauses never hold a server thread
+@st.fragment(run_every=0.5)
+def dramatic_reveal():
+    joke = st.session_state.joke
+    elapsed = time.monotonic() - joke['started']
+    if elapsed < DRAMATIC_SETUP_DELAY:
+        st.info("🥁 Preparing your joke...")
+        return
+    if joke['punchline'] and elapsed < DRAMATIC_PUNCHLINE_DELAY:
+        show_joke(joke['setup'], None)
+        return
+    # Fully revealed: a full rerun draws the finished joke and stops the timer
+    joke['revealed'] = True
+    st.rerun()
 
 # Joke display
 if st.button("Tell Me a Joke!"):
-    with st.spinner("Preparing your joke..."):
-        if delivery_style == "Dramatic":
-            time.sleep(2)
-        
-        setup, punchline = get_joke()
-        
-        with st.container():
-            st.markdown('<div class="joke-box">', unsafe_allow_html=True)
-            st.write(f"**{setup}**")
-            if punchline:
-                if delivery_style == "Dramatic":
-                    time.sleep(1)
-                st.write(f"*{punchline}*")
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Theme-specific celebration
-        if "Circus" in current_theme:
-            st.balloons()
-        elif "Dragon" in current_theme:
-            st.snow()
+    setup, punchline = get_joke()
+    st.session_state.joke = {
+        'setup': setup,
+        'punchline': punchline,
+        'started': time.monotonic(),
+        'revealed': delivery_style != "Dramatic",
+        'celebrated': False
+    }
+
+if not get_joke_buffer().breaker.closed:
+    st.caption("JokeAPI is unavailable right now, so jokes come from our own collection.")
+
+joke = st.session_state.get('joke')
+if joke and not joke['revealed']:
+    dramatic_reveal()
+elif joke:
+    show_joke(joke['setup'], joke['punchline'])
+    if not joke['celebrated']:
+        celebrate()
+        joke['celebrated'] = True
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,147 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Hard limit on points sent to the browser for one trend line
+MAX_CHART_POINTS = 1000
+
+# Trend chart resolution -> pandas resample rule (None means raw entries)
+RESOLUTIONS = {
+    "Raw": None,
+    "Daily": "D",
+    "Weekly": "W-MON",
+    "Monthly": "MS"
+}
+
+
+class FigureCache:
+    """Bounded, thread-safe LRU cache of serialized Plotly figures
+
+    Keys include the mood store's data version, so a cached figure is only
+    reused while the data it was drawn from is unchanged. Shared by every
+    session in the process, with the least recently used entries evicted
+    once `max_entries` is reached.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class AnalyticsWorker:
+    """Thread pool that precomputes analytics in the background
+
+    Jobs are queued per key (one key per mood store). While a key's job is
+    running, newer submissions replace the one waiting behind it, so a
+    burst of saves costs at most one extra refresh. Jobs must only touch
+    data that the submitting thread no longer changes.
+    """
+
+    def __init__(self, max_workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mood-analytics')
+        self._pending = {}
+        self._active = set()
+        self._idle = threading.Condition()
+
+    def submit(self, key, job):
+        """Queue a no-argument callable, replacing any job still waiting for `key`"""
+        with self._idle:
+            self._pending[key] = job
+            if key in self._active:
+                return
+            self._active.add(key)
+        self._pool.submit(self._drain, key)
+
+    def _drain(self, key):
+        while True:
+            with self._idle:
+                job = self._pending.pop(key, None)
+                if job is None:
+                    self._active.discard(key)
+                    self._idle.notify_all()
+                    return
+            try:
+                job()
+            except Exception:
+                logger.exception("Background analytics job failed")
+
+    def wait(self, key, timeout=None):
+        """Block until no job for `key` is queued or running; False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: key not in self._active, timeout)
+
+
+def choose_resolution(df):
+    """Pick a trend chart resolution from the span and size of the data"""
+    if len(df) <= MAX_CHART_POINTS:
+        return "Raw"
+    span_days = (df['date'].max() - df['date'].min()).days
+    if span_days <= 2 * MAX_CHART_POINTS:
+        return "Daily"
+    if span_days <= 7 * MAX_CHART_POINTS:
+        return "Weekly"
+    return "Monthly"
+
+
+def rollup(df, resolution):
+    """Aggregate mood values into mean, min and max per time bucket"""
+    values = df.set_index('date')['mood_value'].astype(float)
+    grouped = values.resample(RESOLUTIONS[resolution], label='left', closed='left')
+    return grouped.agg(['mean', 'min', 'max']).dropna().reset_index()
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling
+
+    Returns the indexes of at most `threshold` points that keep the visual
+    shape of the (x, y) series, always including the first and last point.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket is the third triangle corner
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        areas = np.abs((x[previous] - avg_x) * (y[lo:hi] - y[previous])
+                       - (x[previous] - x[lo:hi]) * (avg_y - y[previous]))
+        previous = lo + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
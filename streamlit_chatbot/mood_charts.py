@@ -0,0 +1,156 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from mood_store import MOODS, ACTIVITIES, activity_counts, activity_co_occurrence
+from mood_analytics import MAX_CHART_POINTS, RESOLUTIONS, choose_resolution, rollup, lttb
+
+# Plotly figure builders for the Analytics page. Importing this module loads
+# the plotting stack, so pages without charts import it only when needed.
+
+
+def create_mood_chart(df, forecast, resolution="Auto"):
+    """Create mood trend chart, rolled up and downsampled for long histories"""
+    if df.empty:
+        return None
+    
+    df = df.sort_values('date', kind='stable')
+    if resolution == "Auto":
+        resolution = choose_resolution(df)
+    
+    if RESOLUTIONS[resolution] is None:
+        keep = lttb(df['date'].to_numpy().astype('int64'), df['mood_value'].to_numpy(), MAX_CHART_POINTS)
+        fig = px.line(df.iloc[keep], x='date', y='mood_value', 
+                      title='Mood Trend Over Time',
+                      labels={'mood_value': 'Mood Score', 'date': 'Date'},
+                      line_shape='spline')
+        fig.update_traces(name='Mood', showlegend=True)
+    else:
+        buckets = rollup(df, resolution)
+        keep = lttb(buckets['date'].to_numpy().astype('int64'), buckets['mean'].to_numpy(), MAX_CHART_POINTS)
+        buckets = buckets.iloc[keep]
+        fig = go.Figure([
+            go.Scatter(x=buckets['date'], y=buckets['max'], mode='lines',
+                       line=dict(width=0), hoverinfo='skip', showlegend=False),
+            go.Scatter(x=buckets['date'], y=buckets['min'], mode='lines', name='Min-Max',
+                       line=dict(width=0), fill='tonexty', fillcolor='rgba(33, 150, 243, 0.2)'),
+            go.Scatter(x=buckets['date'], y=buckets['mean'], mode='lines', name=f'{resolution} Mean',
+                       line=dict(color='#2196F3'))
+        ])
+        fig.update_layout(title=f'Mood Trend Over Time ({resolution} Mean, Min-Max Range)',
+                          xaxis_title='Date', yaxis_title='Mood Score')
+    
+    # Smoothed level and next-day forecast overlay
+    smoothed = pd.DataFrame(forecast.series(), columns=['date', 'level'])
+    smoothed['date'] = smoothed['date'].astype('datetime64[ns]')
+    smoothed = smoothed[smoothed['date'].between(df['date'].min(), df['date'].max())]
+    if not smoothed.empty:
+        keep = lttb(smoothed['date'].to_numpy().astype('int64'), smoothed['level'].to_numpy(), MAX_CHART_POINTS)
+        smoothed = smoothed.iloc[keep]
+        fig.add_trace(go.Scatter(x=smoothed['date'], y=smoothed['level'], mode='lines', name='Smoothed',
+                                 line=dict(color='#FF9800', dash='dot')))
+        next_day, predicted, low, high = forecast.predict()
+        if pd.Timestamp(next_day) > df['date'].max():
+            fig.add_trace(go.Scatter(x=[pd.Timestamp(next_day)], y=[predicted], mode='markers', name='Forecast',
+                                     marker=dict(color='#FF9800', size=10),
+                                     error_y=dict(type='data', symmetric=False,
+                                                  array=[high - predicted], arrayminus=[predicted - low])))
+    
+    fig.update_layout(
+        yaxis=dict(range=[0, 6], tickmode='linear', tick0=1, dtick=1),
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        height=400
+    )
+    
+    return fig
+
+
+def create_activity_chart(df):
+    """Create activity frequency chart"""
+    if df.empty:
+        return None
+    
+    counts = activity_counts(df['activities'].to_numpy())
+    counts = counts[counts > 0].sort_values(ascending=False)
+    
+    if counts.empty:
+        return None
+    
+    fig = px.bar(x=counts.values, y=counts.index, 
+                 orientation='h',
+                 title='Most Frequent Activities',
+                 labels={'x': 'Frequency', 'y': 'Activities'})
+    
+    fig.update_layout(height=400)
+    return fig
+
+
+def create_activity_pairs_chart(df):
+    """Create heatmap of activities logged together"""
+    if df.empty:
+        return None
+    
+    pairs = activity_co_occurrence(df['activities'].to_numpy())
+    logged = [activity for activity in ACTIVITIES if pairs.loc[activity, activity] > 0]
+    if len(logged) < 2:
+        return None
+    
+    fig = px.imshow(pairs.loc[logged, logged], 
+                    title='Activities Done Together',
+                    labels={'color': 'Entries'},
+                    color_continuous_scale='Blues')
+    fig.update_layout(height=500)
+    return fig
+
+
+def create_activity_lift_chart(lift):
+    """Create chart of mood lift per activity with confidence intervals"""
+    if lift.empty:
+        return None
+    
+    lift = lift.sort_values('mood_lift')
+    fig = go.Figure(go.Bar(
+        x=lift['mood_lift'], y=lift.index, orientation='h',
+        error_x=dict(type='data', symmetric=False,
+                     array=lift['ci_high'] - lift['mood_lift'],
+                     arrayminus=lift['mood_lift'] - lift['ci_low']),
+        marker_color=['#4CAF50' if value >= 0 else '#F44336' for value in lift['mood_lift']]
+    ))
+    fig.update_layout(title='Mood Lift by Activity (95% CI)',
+                      xaxis_title='Mood score difference (with - without)',
+                      height=400)
+    return fig
+
+
+def create_mood_pie(df):
+    """Create mood distribution pie chart"""
+    if df.empty:
+        return None
+    
+    mood_counts = df['mood'].value_counts()
+    mood_counts = mood_counts[mood_counts > 0]
+    
+    return px.pie(values=mood_counts.values, names=[MOODS[m]['name'] for m in mood_counts.index],
+                  title="Mood Distribution")
+
+
+def create_sleep_energy_chart(df):
+    """Create sleep vs energy scatter chart"""
+    if df.empty:
+        return None
+    
+    return px.scatter(df, x='sleep_hours', y='energy_level', 
+                      color='mood_value', 
+                      title='Sleep vs Energy Levels',
+                      labels={'sleep_hours': 'Hours of Sleep', 'energy_level': 'Energy Level'})
+
+
+def build_figures(df, forecast, resolution="Auto"):
+    """Build the serialized Analytics figures for a DataFrame of entries"""
+    figures = {}
+    for name, builder in [('pie', create_mood_pie), ('trend', create_mood_chart),
+                          ('activities', create_activity_chart), ('pairs', create_activity_pairs_chart),
+                          ('scatter', create_sleep_energy_chart)]:
+        fig = builder(df, forecast, resolution) if name == 'trend' else builder(df)
+        figures[name] = fig.to_dict() if fig else None
+    return figures
@@ -0,0 +1,168 @@
+# Static page content, built once per process when first imported
+
+APP_CSS = """
+<style>
+    /* Apply Times New Roman to all text elements */
+    .stApp, .stApp * {
+        font-family: 'Times New Roman', Times, serif !important;
+    }
+    
+    /* Specific styling for different elements */
+    h1, h2, h3, h4, h5, h6 {
+        font-family: 'Times New Roman', Times, serif !important;
+    }
+    
+    .stSelectbox label, .stTextInput label, .stTextArea label, 
+    .stSlider label, .stNumberInput label, .stMultiSelect label,
+    .stRadio label, .stCheckbox label {
+        font-family: 'Times New Roman', Times, serif !important;
+    }
+    
+    .stButton button {
+        font-family: 'Times New Roman', Times, serif !important;
+    }
+    
+    .stMarkdown, .stText {
+        font-family: 'Times New Roman', Times, serif !important;
+    }
+    
+    .stSidebar * {
+        font-family: 'Times New Roman', Times, serif !important;
+    }
+    
+    /* Form elements */
+    input, textarea, select {
+        font-family: 'Times New Roman', Times, serif !important;
+    }
+    
+    /* Metrics and other components */
+    .metric-container, .stMetric {
+        font-family: 'Times New Roman', Times, serif !important;
+    }
+</style>
+"""
+
+WELLNESS_TIPS = {
+    1: [
+        "Try deep breathing exercises for 5 minutes",
+        "Take a short walk outside",
+        "Listen to calming music",
+        "Call a friend or family member",
+        "Practice gratitude by writing 3 things you're thankful for"
+    ],
+    2: [
+        "Engage in light physical activity",
+        "Try a new hobby or creative activity",
+        "Watch something funny or uplifting",
+        "Take a warm bath or shower",
+        "Practice mindfulness meditation"
+    ],
+    3: [
+        "Set small, achievable goals for the day",
+        "Try a new recipe or meal",
+        "Organize your living space",
+        "Connect with nature",
+        "Practice a skill you want to improve"
+    ],
+    4: [
+        "Channel your energy into a workout",
+        "Share your enthusiasm with others",
+        "Start a new project or challenge",
+        "Celebrate your achievements",
+        "Help someone else with their goals"
+    ],
+    5: [
+        "Spread positivity to others",
+        "Reflect on what's going well",
+        "Plan something to look forward to",
+        "Take photos of beautiful moments",
+        "Practice acts of kindness"
+    ]
+}
+
+SONG_RECOMMENDATIONS = {
+    "😊": {  # Happy
+        "genre": "Uplifting Pop",
+        "songs": [
+            "Happy - Pharrell Williams",
+            "Good 4 U - Olivia Rodrigo",
+            "Sunflower - Post Malone",
+            "Can't Stop the Feeling - Justin Timberlake",
+            "Walking on Sunshine - Katrina & The Waves",
+            "Feel Good Inc. - Gorillaz",
+            "Uptown Funk - Bruno Mars"
+        ]
+    },
+    "😄": {  # Excited
+        "genre": "High Energy",
+        "songs": [
+            "Thunder - Imagine Dragons",
+            "Stronger - Kelly Clarkson",
+            "Roar - Katy Perry",
+            "Pump It - Black Eyed Peas",
+            "Eye of the Tiger - Survivor",
+            "Don't Stop Me Now - Queen",
+            "High Hopes - Panic! At The Disco"
+        ]
+    },
+    "😐": {  # Neutral
+        "genre": "Chill Vibes",
+        "songs": [
+            "Blinding Lights - The Weeknd",
+            "Watermelon Sugar - Harry Styles",
+            "Levitating - Dua Lipa",
+            "Heat Waves - Glass Animals",
+            "Stay - The Kid LAROI & Justin Bieber",
+            "Peaches - Justin Bieber",
+            "Good Days - SZA"
+        ]
+    },
+    "😔": {  # Sad
+        "genre": "Comforting & Healing",
+        "songs": [
+            "Someone Like You - Adele",
+            "Fix You - Coldplay",
+            "The Sound of Silence - Simon & Garfunkel",
+            "Mad World - Gary Jules",
+            "Hurt - Johnny Cash",
+            "Breathe Me - Sia",
+            "Skinny Love - Bon Iver"
+        ]
+    },
+    "😡": {  # Angry
+        "genre": "Release & Rock",
+        "songs": [
+            "Stressed Out - Twenty One Pilots",
+            "In the End - Linkin Park",
+            "Somebody That I Used to Know - Gotye",
+            "Counting Stars - OneRepublic",
+            "Radioactive - Imagine Dragons",
+            "Numb - Linkin Park",
+            "Breaking the Habit - Linkin Park"
+        ]
+    },
+    "😰": {  # Anxious
+        "genre": "Calming & Peaceful",
+        "songs": [
+            "Weightless - Marconi Union",
+            "Clair de Lune - Claude Debussy",
+            "Aqueous Transmission - Incubus",
+            "Spiegel im Spiegel - Arvo Pärt",
+            "River - Joni Mitchell",
+            "The Night We Met - Lord Huron",
+            "Holocene - Bon Iver"
+        ]
+    },
+    "😴": {  # Tired
+        "genre": "Gentle & Soothing",
+        "songs": [
+            "Sleep Baby Sleep - Broods",
+            "Dream a Little Dream - Ella Fitzgerald",  
+            "La Vie En Rose - Édith Piaf",
+            "Moonlight Sonata - Beethoven",
+            "Sleepyhead - Passion Pit",
+            "Lullaby - Brahms",
+            "Weightless - Marconi Union"
+        ]
+    }
+}
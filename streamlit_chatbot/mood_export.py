@@ -0,0 +1,76 @@
+import os
+import tempfile
+
+from mood_store import decode_activities
+
+# Export format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet")
+}
+
+EXPORT_COLUMNS = ['date', 'time', 'mood', 'mood_value', 'activities',
+                  'notes', 'energy_level', 'sleep_hours']
+
+
+def _prepare(batch):
+    """Put one batch of mood entries into export layout"""
+    timestamps = batch['date']
+    batch = batch.reindex(columns=EXPORT_COLUMNS)
+    batch['date'] = timestamps.dt.strftime('%Y-%m-%d')
+    batch['time'] = timestamps.dt.strftime('%H:%M')
+    batch['mood'] = batch['mood'].astype(str)
+    batch['activities'] = batch['activities'].map(decode_activities)
+    return batch
+
+
+def write_csv(batches, path):
+    """Write batches of mood entries to a CSV file, one batch in memory at a time"""
+    with open(path, 'w', newline='', encoding='utf-8') as out:
+        header = True
+        for batch in batches:
+            batch = _prepare(batch)
+            batch['activities'] = batch['activities'].map('; '.join)
+            batch.to_csv(out, index=False, header=header)
+            header = False
+        if header:
+            out.write(','.join(EXPORT_COLUMNS) + '\n')
+
+
+def write_parquet(batches, path):
+    """Write batches of mood entries to a Parquet file as one row group per batch"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('date', pa.string()),
+        ('time', pa.string()),
+        ('mood', pa.string()),
+        ('mood_value', pa.int8()),
+        ('activities', pa.list_(pa.string())),
+        ('notes', pa.string()),
+        ('energy_level', pa.int8()),
+        ('sleep_hours', pa.float32())
+    ])
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for batch in batches:
+            batch = _prepare(batch)
+            writer.write_table(pa.Table.from_pandas(batch, schema=schema, preserve_index=False))
+
+
+def export_moods(batches, export_format):
+    """Stream mood entries to a temporary export file and return its bytes
+
+    Entries are serialized batch by batch, so only one batch plus the
+    finished file are held at once rather than the whole history as a
+    DataFrame and a second in-memory copy as text.
+    """
+    writer = write_parquet if export_format == "Parquet" else write_csv
+    fd, path = tempfile.mkstemp(suffix='.' + EXPORT_FORMATS[export_format][0])
+    os.close(fd)
+    try:
+        writer(batches, path)
+        with open(path, 'rb') as exported:
+            return exported.read()
+    finally:
+        os.remove(path)
@@ -0,0 +1,87 @@
+import io
+import json
+
+import pandas as pd
+
+IMPORT_TYPES = ['csv', 'json', 'parquet']
+
+
+def read_upload(name, data):
+    """Read an uploaded CSV, JSON or Parquet file into a DataFrame"""
+    extension = name.rsplit('.', 1)[-1].lower()
+    if extension == 'csv':
+        return pd.read_csv(io.BytesIO(data), dtype={'time': str, 'notes': str, 'activities': str},
+                           keep_default_na=False)
+    if extension == 'json':
+        records = json.loads(data)
+        # Accept either a list of entries or {"mood_data": [...]}
+        if isinstance(records, dict):
+            records = records.get('mood_data', [])
+        return pd.DataFrame.from_records(records)
+    if extension == 'parquet':
+        return pd.read_parquet(io.BytesIO(data))
+    raise ValueError(f"Unsupported file type: .{extension}")
+
+
+def _split_activities(value):
+    """Turn one activities cell (list, '; '-joined or a list repr) into a list without repeats"""
+    if isinstance(value, str):
+        value = value.strip().strip('[]')
+        separator = ';' if ';' in value else ','
+        value = [item.strip().strip('\'"') for item in value.split(separator) if item.strip()]
+    elif value is None or (isinstance(value, float) and pd.isna(value)):
+        return []
+    return list(dict.fromkeys(value))
+
+
+def validate_moods(df, moods, activities):
+    """Validate imported mood entries column by column
+
+    Returns (valid entries, list of problem descriptions). Moods must be
+    keys of `moods`, activities must come from `activities`, energy must be
+    1-10 and sleep 0-24 hours. Invalid rows are dropped, not repaired.
+    """
+    required = ['date', 'mood']
+    missing = [column for column in required if column not in df.columns]
+    if missing:
+        return df.iloc[0:0], [f"Missing required column(s): {', '.join(missing)}"]
+
+    out = pd.DataFrame(index=df.index)
+    out['date'] = pd.to_datetime(df['date'], errors='coerce').dt.normalize()
+    if 'time' in df:
+        # Fold HH:MM into the timestamp; unparseable times count as midnight
+        times = pd.to_timedelta(df['time'].astype(str) + ':00', errors='coerce')
+        out['date'] += times.fillna(pd.Timedelta(0))
+    out['mood'] = df['mood'].astype(str)
+    out['mood_value'] = out['mood'].map({emoji: info['value'] for emoji, info in moods.items()})
+    out['activities'] = (df['activities'].map(_split_activities) if 'activities' in df
+                         else pd.Series([[] for _ in range(len(df))], index=df.index))
+    out['notes'] = df['notes'].fillna('').astype(str) if 'notes' in df else ''
+    out['energy_level'] = pd.to_numeric(df['energy_level'], errors='coerce') if 'energy_level' in df else 5
+    out['sleep_hours'] = pd.to_numeric(df['sleep_hours'], errors='coerce') if 'sleep_hours' in df else 8.0
+
+    # Every listed activity must be known; explode once and reduce per row
+    exploded = out['activities'].explode()
+    known = exploded.isna() | exploded.isin(activities)
+    activities_ok = known.groupby(level=0).all()
+
+    checks = {
+        "invalid date": out['date'].notna(),
+        "unknown mood": out['mood_value'].notna(),
+        "unknown activity": activities_ok.reindex(out.index, fill_value=True),
+        "energy level outside 1-10": out['energy_level'].between(1, 10),
+        "sleep hours outside 0-24": out['sleep_hours'].between(0, 24)
+    }
+    valid = pd.Series(True, index=out.index)
+    problems = []
+    for reason, passed in checks.items():
+        failed = int((~passed & valid).sum())
+        if failed:
+            problems.append(f"{failed} row(s) with {reason}")
+        valid &= passed
+
+    out = out[valid].reset_index(drop=True)
+    out['mood_value'] = out['mood_value'].astype('int8')
+    out['energy_level'] = out['energy_level'].astype('int8')
+    out['sleep_hours'] = out['sleep_hours'].astype('float32')
+    return out, problems
@@ -0,0 +1,149 @@
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
+# Per-session cap, in megabytes, on entry data held in memory; entries past
+# it spill to segment files. Split evenly between mood entries and the diary
+# (bodies, entries and search index).
+SESSION_MEMORY_MB = float(os.environ.get("MOOD_TRACKER_SESSION_MB", "16"))
+SEGMENT_DIR = os.environ.get(
+    "MOOD_TRACKER_SEGMENT_DIR",
+    os.path.join(tempfile.gettempdir(), "mood_tracker_segments")
+)
+# Records copied per step when a segment file is rewritten
+COPY_CHUNK = 65536
+
+
+def session_memory_limits():
+    """Return the (mood store, diary store) byte limits for one session"""
+    limit = int(SESSION_MEMORY_MB * 1024 * 1024)
+    return limit // 2, limit - limit // 2
+
+
+def _remove(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class BlobFile:
+    """Append-only file of byte strings addressed by (offset, length)
+
+    Reads go through a memory map that is reopened only after the file has
+    grown, so paging a value back in touches just the pages it spans. The
+    file is deleted when the owning object is garbage collected.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self._map = None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'wb').close()
+        weakref.finalize(self, _remove, [path])
+
+    def append(self, values):
+        """Write byte strings and return their offsets"""
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        offsets = self.size + np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+        with open(self.path, 'ab') as handle:
+            handle.write(b''.join(values))
+        self.size += int(lengths.sum())
+        self._map = None
+        return offsets
+
+    def read(self, offset, length):
+        if not length:
+            return b''
+        if self._map is None:
+            self._map = np.memmap(self.path, dtype=np.uint8, mode='r', shape=(self.size,))
+        return self._map[offset:offset + length].tobytes()
+
+
+class MoodSegment:
+    """On-disk columnar segment holding the cold rows of a MoodStore
+
+    Fixed-width columns are stored as one record per row in a `.rows` file
+    and notes as UTF-8 in a `.notes` blob, with each record holding the
+    offset and length of its note. Rows keep their store order; reads map
+    the files and copy out only the requested rows.
+    """
+
+    def __init__(self, columns, name, directory=SEGMENT_DIR):
+        self.fields = [column for column, dtype in columns.items() if dtype is not object]
+        self.text_fields = [column for column, dtype in columns.items() if dtype is object]
+        record = [(column, columns[column]) for column in self.fields]
+        for column in self.text_fields:
+            record += [(f'{column}_offset', np.int64), (f'{column}_length', np.int32)]
+        self.record = np.dtype(record)
+        self.path = os.path.join(directory, f'{name}.rows')
+        self.blob = BlobFile(os.path.join(directory, f'{name}.notes'))
+        open(self.path, 'wb').close()
+        weakref.finalize(self, _remove, [self.path])
+        self._count = 0
+        self._records = None
+
+    def __len__(self):
+        return self._count
+
+    def records(self):
+        """Return a read-only memory map over every record"""
+        if self._records is None:
+            if not self._count:
+                return np.empty(0, dtype=self.record)
+            self._records = np.memmap(self.path, dtype=self.record, mode='r', shape=(self._count,))
+        return self._records
+
+    def append(self, columns):
+        """Append rows given as {column: array}, all of the same length"""
+        count = len(columns[self.fields[0]])
+        records = np.empty(count, dtype=self.record)
+        for column in self.fields:
+            records[column] = columns[column]
+        for column in self.text_fields:
+            encoded = [(value or '').encode('utf-8') for value in columns[column]]
+            records[f'{column}_offset'] = self.blob.append(encoded)
+            records[f'{column}_length'] = [len(value) for value in encoded]
+        with open(self.path, 'ab') as handle:
+            records.tofile(handle)
+        self._count += count
+        self._records = None
+
+    def read(self, column, rows=None):
+        """Return one column for the given rows (all rows if None)
+
+        Fixed-width columns over all rows come back as a view of the map;
+        text columns are decoded into an object array.
+        """
+        records = self.records()
+        if rows is not None:
+            records = records[rows]
+        if column not in self.text_fields:
+            return records[column]
+        values = np.empty(len(records), dtype=object)
+        for i, (offset, length) in enumerate(zip(records[f'{column}_offset'].tolist(),
+                                                 records[f'{column}_length'].tolist())):
+            values[i] = self.blob.read(offset, length).decode('utf-8')
+        return values
+
+    def delete(self, row):
+        """Remove one row by rewriting the records file
+
+        The rewrite goes to a new file that replaces the old one, so maps
+        handed out earlier stay valid. The note's bytes stay in the blob.
+        """
+        records = self.records()
+        temp = self.path + '.tmp'
+        with open(temp, 'wb') as handle:
+            for start in range(0, self._count, COPY_CHUNK):
+                chunk = records[start:start + COPY_CHUNK]
+                if start <= row < start + COPY_CHUNK:
+                    chunk = np.delete(chunk, row - start)
+                chunk.tofile(handle)
+        os.replace(temp, self.path)
+        self._count -= 1
+        self._records = None
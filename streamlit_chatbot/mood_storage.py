@@ -0,0 +1,468 @@
+import itertools
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from mood_store import decode_activities, encode_activity_column, mood_categorical, encode_moods
+from diary_store import DiaryEntry
+
+logger = logging.getLogger(__name__)
+
+# Storage backend selection: "sqlite" (default) or "memory"
+STORAGE_KIND = os.environ.get("MOOD_TRACKER_STORAGE", "sqlite")
+DB_PATH = os.environ.get(
+    "MOOD_TRACKER_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "mood_tracker.db")
+)
+# Owner of rows written before data was partitioned by user
+DEFAULT_USER = "default"
+# Opt-in for single-user or trusted deployments: with MOOD_TRACKER_DEFAULT_USER=1
+# sessions without a signed-in user save under DEFAULT_USER (shared by all of
+# them) instead of keeping their entries in memory for the session only
+SAVE_SIGNED_OUT = os.environ.get("MOOD_TRACKER_DEFAULT_USER", "").lower() in ("1", "true", "yes")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS moods (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL DEFAULT 'default',
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    mood TEXT NOT NULL,
+    mood_value INTEGER NOT NULL,
+    activities TEXT NOT NULL,
+    notes TEXT,
+    energy_level INTEGER NOT NULL,
+    sleep_hours REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS diary (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL DEFAULT 'default',
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT,
+    mood TEXT,
+    word_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS wellness (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL DEFAULT 'default',
+    date TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+"""
+
+# Created after older files have gained their user_id column
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_moods_user_date ON moods (user_id, date);
+CREATE INDEX IF NOT EXISTS idx_moods_user_mood ON moods (user_id, mood, date);
+CREATE INDEX IF NOT EXISTS idx_diary_user_date ON diary (user_id, date, time);
+CREATE INDEX IF NOT EXISTS idx_wellness_user_date ON wellness (user_id, date);
+DROP INDEX IF EXISTS idx_moods_date;
+DROP INDEX IF EXISTS idx_moods_mood;
+DROP INDEX IF EXISTS idx_diary_date;
+DROP INDEX IF EXISTS idx_wellness_date;
+"""
+
+MOOD_FIELDS = ['id', 'date', 'time', 'mood', 'mood_value', 'activities',
+               'notes', 'energy_level', 'sleep_hours']
+DIARY_FIELDS = ['id', 'date', 'time', 'title', 'content', 'mood', 'word_count']
+WELLNESS_FIELDS = ['id', 'date', 'payload']
+
+
+class WriteError(Exception):
+    """Queued writes that the database rejected"""
+
+
+def _insert(table, fields):
+    """Build an INSERT statement for `fields` plus the owning user_id"""
+    columns = fields + ['user_id']
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+INSERT_MOOD = _insert('moods', MOOD_FIELDS)
+INSERT_DIARY = _insert('diary', DIARY_FIELDS)
+INSERT_WELLNESS = _insert('wellness', WELLNESS_FIELDS)
+
+
+def _activity_names(value):
+    """Return activity names from a list or a bitmask"""
+    if isinstance(value, (int, np.integer)):
+        return decode_activities(value)
+    return list(dict.fromkeys(value))
+
+
+def _day(value):
+    """Format a date-like value as YYYY-MM-DD"""
+    return str(np.datetime64(value, 'D'))
+
+
+def _time(value):
+    """Format a timestamp as HH:MM"""
+    return pd.Timestamp(value).strftime('%H:%M')
+
+
+class MemoryBackend:
+    """Session-only storage; filters run over the in-memory mood store"""
+
+    user_id = None
+
+    def __init__(self, store):
+        self.store = store
+        self._next_id = 1
+
+    def _new_id(self):
+        entry_id = self._next_id
+        self._next_id += 1
+        return entry_id
+
+    def load_moods(self):
+        return pd.DataFrame()
+
+    def load_diary(self):
+        return []
+
+    def load_wellness(self):
+        return []
+
+    def add_mood(self, entry):
+        return self._new_id()
+
+    def add_moods(self, df):
+        """Assign ids to a DataFrame of new entries"""
+        ids = np.arange(self._next_id, self._next_id + len(df), dtype=np.int64)
+        self._next_id += len(df)
+        return ids
+
+    def add_diary(self, entry):
+        return self._new_id()
+
+    def add_wellness(self, entry):
+        return self._new_id()
+
+    def delete_mood(self, entry_id):
+        pass
+
+    def delete_diary(self, entry_id):
+        pass
+
+    def query_moods(self, start=None, end=None, moods=None, activities=None,
+                    limit=None, offset=0, newest_first=False):
+        """Return one page of mood entries matching the filters as a DataFrame"""
+        rows = self.store.select(start=start, end=end, moods=moods, activities=activities)
+        if newest_first:
+            rows = rows[::-1]
+        stop = None if limit is None else offset + limit
+        return self.store.take(rows[offset:stop])
+
+    def count_moods(self, start=None, end=None, moods=None, activities=None):
+        return len(self.store.select(start=start, end=end, moods=moods, activities=activities))
+
+    def iter_moods(self, start=None, end=None, moods=None, activities=None, batch_size=5000):
+        """Yield mood entries matching the filters as DataFrames of at most batch_size rows"""
+        rows = self.store.select(start=start, end=end, moods=moods, activities=activities)
+        for offset in range(0, len(rows), batch_size):
+            yield self.store.take(rows[offset:offset + batch_size])
+
+    def flush(self):
+        pass
+
+
+class SQLiteService:
+    """Process-wide access to the SQLite file, shared by every session
+
+    Reads borrow a connection from a fixed pool, and since the database
+    runs in WAL mode they never wait on the writer. All inserts and
+    deletes go through one writer thread, which drains its queue in
+    batches and commits each batch in a single transaction. If a batch
+    fails, its writes are retried one transaction each, so one bad write
+    never takes other sessions' writes with it; the ones that still fail
+    are kept for `failures` to report to their submitter. Ids come from
+    per-table counters, so callers get them without waiting for the write.
+    """
+
+    def __init__(self, path=DB_PATH, readers=4, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        writer = self._connect()
+        self._migrate(writer)
+        self._next_ids = {
+            table: writer.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+            for table in ('moods', 'diary', 'wellness')
+        }
+        self._id_lock = threading.Lock()
+        self._readers = queue.Queue()
+        for _ in range(readers):
+            self._readers.put(self._connect())
+        self._writes = queue.Queue()
+        self._submitted = 0
+        self._committed = 0
+        self._failed = {}
+        self._progress = threading.Condition()
+        threading.Thread(target=self._write_loop, args=(writer,), name='mood-db-writer', daemon=True).start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _migrate(conn):
+        conn.executescript(SCHEMA)
+        for table in ('moods', 'diary', 'wellness'):
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+            if 'user_id' not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER}'")
+        conn.executescript(INDEXES)
+
+    def new_ids(self, table, count=1):
+        """Reserve `count` consecutive ids in a table and return the first"""
+        with self._id_lock:
+            first = self._next_ids[table]
+            self._next_ids[table] += count
+        return first
+
+    def write(self, sql, rows):
+        """Queue a statement with a list of parameter tuples; returns its sequence number"""
+        with self._progress:
+            self._submitted += 1
+            self._writes.put((self._submitted, sql, rows))
+            return self._submitted
+
+    def wait(self, sequence):
+        """Block until every write up to `sequence` has been processed"""
+        with self._progress:
+            self._progress.wait_for(lambda: self._committed >= sequence)
+
+    def failures(self, sequences):
+        """Remove and return the errors of any of these writes that failed"""
+        with self._progress:
+            return [self._failed.pop(sequence) for sequence in sequences if sequence in self._failed]
+
+    def _commit(self, conn, batch):
+        """Commit a batch, retrying its writes one by one if it fails; returns {sequence: error}"""
+        try:
+            with conn:
+                # Consecutive writes of the same statement share one executemany
+                for sql, group in itertools.groupby(batch, key=lambda write: write[1]):
+                    conn.executemany(sql, [row for _, _, rows in group for row in rows])
+            return {}
+        except Exception as error:
+            logger.warning("Batch of %d writes failed (%s); retrying them one by one", len(batch), error)
+        failed = {}
+        for sequence, sql, rows in batch:
+            try:
+                with conn:
+                    conn.executemany(sql, rows)
+            except Exception as error:
+                logger.error("Queued write %d failed: %s", sequence, error)
+                failed[sequence] = error
+        return failed
+
+    def _write_loop(self, conn):
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            failed = {}
+            try:
+                failed = self._commit(conn, batch)
+            except Exception as error:
+                # Anything unexpected fails the batch; the writer itself must
+                # keep running, or every wait() would block forever
+                logger.exception("Writer failed on %d queued writes", len(batch))
+                failed = {sequence: error for sequence, _, _ in batch}
+            finally:
+                with self._progress:
+                    self._failed.update(failed)
+                    self._committed = batch[-1][0]
+                    self._progress.notify_all()
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read connection from the pool"""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+
+class SQLiteBackend:
+    """One user's view of a shared SQLiteService
+
+    Activities are saved as JSON lists of names, so the file stays readable
+    if ACTIVITIES changes, and are packed into bitmasks when read back.
+    Every query is scoped to `user_id` and answered by SQL over the
+    per-user indexes. Writes are queued on the service's writer thread;
+    reads first wait for this session's own writes, so a session always
+    sees what it saved, and `flush` raises WriteError for any of them
+    that the database rejected.
+    """
+
+    def __init__(self, service, user_id=DEFAULT_USER):
+        self.service = service
+        self.user_id = user_id
+        self._last_write = 0
+        self._unchecked = []
+
+    def _write(self, sql, rows):
+        self._last_write = self.service.write(sql, rows)
+        self._unchecked.append(self._last_write)
+
+    def _sync(self):
+        self.service.wait(self._last_write)
+
+    def flush(self):
+        """Wait until this session's queued writes are done; raise WriteError if any failed"""
+        self._sync()
+        errors = self.service.failures(self._unchecked)
+        self._unchecked = []
+        if errors:
+            raise WriteError(f"{len(errors)} change(s) could not be saved: {errors[0]}")
+
+    def add_mood(self, entry):
+        entry_id = self.service.new_ids('moods')
+        self._write(INSERT_MOOD, [(
+            entry_id, _day(entry['date']), _time(entry['date']), entry['mood'], int(entry['mood_value']),
+            json.dumps(_activity_names(entry['activities'])), entry['notes'],
+            int(entry['energy_level']), float(entry['sleep_hours']), self.user_id
+        )])
+        return entry_id
+
+    def add_moods(self, df):
+        """Queue a DataFrame of new entries as one write and return their ids"""
+        first = self.service.new_ids('moods', len(df))
+        ids = np.arange(first, first + len(df), dtype=np.int64)
+        rows = zip(
+            ids.tolist(),
+            df['date'].dt.strftime('%Y-%m-%d'),
+            df['date'].dt.strftime('%H:%M'),
+            df['mood'].astype(str),
+            df['mood_value'].astype(int).tolist(),
+            [json.dumps(_activity_names(activities)) for activities in df['activities']],
+            df['notes'],
+            df['energy_level'].astype(int).tolist(),
+            df['sleep_hours'].astype(float).tolist(),
+            itertools.repeat(self.user_id)
+        )
+        self._write(INSERT_MOOD, list(rows))
+        return ids
+
+    def add_diary(self, entry):
+        entry_id = self.service.new_ids('diary')
+        self._write(INSERT_DIARY, [(
+            entry_id, _day(entry.timestamp), _time(entry.timestamp), entry.title, entry.content,
+            entry.mood, int(entry.word_count), self.user_id
+        )])
+        return entry_id
+
+    def add_wellness(self, entry):
+        entry_id = self.service.new_ids('wellness')
+        self._write(INSERT_WELLNESS, [(entry_id, _day(entry['date']), json.dumps(entry, default=str),
+                                       self.user_id)])
+        return entry_id
+
+    def delete_mood(self, entry_id):
+        self._write("DELETE FROM moods WHERE id = ? AND user_id = ?", [(entry_id, self.user_id)])
+
+    def delete_diary(self, entry_id):
+        self._write("DELETE FROM diary WHERE id = ? AND user_id = ?", [(entry_id, self.user_id)])
+
+    def _read_moods(self, where, params, order="id", limit=None, offset=0):
+        self._sync()
+        sql = f"SELECT {', '.join(MOOD_FIELDS)} FROM moods {where} ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = list(params) + [limit, offset]
+        with self.service.reader() as conn:
+            return self._decode(pd.read_sql_query(sql, conn, params=params))
+
+    @staticmethod
+    def _decode(df):
+        df['date'] = pd.to_datetime(df['date'] + ' ' + df.pop('time'))
+        df['mood'] = mood_categorical(encode_moods(df['mood']))
+        df['activities'] = encode_activity_column(df['activities'].map(json.loads))
+        return df
+
+    def load_moods(self):
+        return self._read_moods(*self._where())
+
+    def load_diary(self):
+        self._sync()
+        with self.service.reader() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(DIARY_FIELDS)} FROM diary WHERE user_id = ? ORDER BY id",
+                (self.user_id,)).fetchall()
+        return [DiaryEntry(entry_id, f"{date} {time}", title, content, mood, word_count)
+                for entry_id, date, time, title, content, mood, word_count in rows]
+
+    def load_wellness(self):
+        self._sync()
+        with self.service.reader() as conn:
+            rows = conn.execute("SELECT payload FROM wellness WHERE user_id = ? ORDER BY id",
+                                (self.user_id,)).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def _where(self, start=None, end=None, moods=None, activities=None):
+        clauses, params = ["user_id = ?"], [self.user_id]
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(_day(start))
+        if end is not None:
+            clauses.append("date <= ?")
+            params.append(_day(end))
+        if moods:
+            clauses.append(f"mood IN ({', '.join('?' for _ in moods)})")
+            params.extend(moods)
+        if activities:
+            clauses.append(f"({' OR '.join('activities LIKE ?' for _ in activities)})")
+            params.extend(f'%"{name}"%' for name in activities)
+        return f"WHERE {' AND '.join(clauses)}", params
+
+    def query_moods(self, start=None, end=None, moods=None, activities=None,
+                    limit=None, offset=0, newest_first=False):
+        """Return one page of mood entries matching the filters, evaluated in SQL"""
+        where, params = self._where(start, end, moods, activities)
+        order = "date DESC, time DESC, id DESC" if newest_first else "id"
+        return self._read_moods(where, params, order, limit, offset)
+
+    def iter_moods(self, start=None, end=None, moods=None, activities=None, batch_size=5000):
+        """Yield mood entries matching the filters as DataFrames of at most batch_size rows"""
+        self._sync()
+        where, params = self._where(start, end, moods, activities)
+        sql = f"SELECT {', '.join(MOOD_FIELDS)} FROM moods {where} ORDER BY date, time, id"
+        with self.service.reader() as conn:
+            for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=batch_size):
+                yield self._decode(chunk)
+
+    def count_moods(self, start=None, end=None, moods=None, activities=None):
+        self._sync()
+        where, params = self._where(start, end, moods, activities)
+        with self.service.reader() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM moods {where}", params).fetchone()[0]
+
+
+def open_backend(store, user_id=None, service=None):
+    """Create the storage backend selected by MOOD_TRACKER_STORAGE
+
+    Data is saved only for a `user_id`, which is an authenticated account
+    or DEFAULT_USER when SAVE_SIGNED_OUT is set; without one the session
+    gets a MemoryBackend, so nothing it writes is visible to, or readable
+    by, any other session. `service` returns the shared
+    SQLiteService; without it a private one is opened on DB_PATH.
+    """
+    if STORAGE_KIND == "memory" or user_id is None:
+        return MemoryBackend(store)
+    return SQLiteBackend(service() if service else SQLiteService(DB_PATH), user_id)
@@ -0,0 +1,913 @@
+import copy
+import logging
+import uuid
+from collections import deque
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from mood_segments import SEGMENT_DIR, MoodSegment
+
+logger = logging.getLogger(__name__)
+
+# Mood code i in the store stands for the i-th key of MOODS; only ever
+# append to this dict so saved codes keep their meaning
+MOODS = {
+    "😊": {"name": "Happy", "value": 5, "color": "#4CAF50"},
+    "😄": {"name": "Excited", "value": 4, "color": "#FF9800"},
+    "😐": {"name": "Neutral", "value": 3, "color": "#9E9E9E"},
+    "😔": {"name": "Sad", "value": 2, "color": "#2196F3"},
+    "😡": {"name": "Angry", "value": 1, "color": "#F44336"},
+    "😰": {"name": "Anxious", "value": 1, "color": "#9C27B0"},
+    "😴": {"name": "Tired", "value": 2, "color": "#607D8B"}
+}
+MOOD_EMOJIS = list(MOODS)
+MOOD_CODES = {emoji: code for code, emoji in enumerate(MOOD_EMOJIS)}
+
+# Bit i of an entry's activity mask stands for ACTIVITIES[i]; only ever
+# append to this list so saved masks keep their meaning
+ACTIVITIES = [
+    "Exercise", "Meditation", "Reading", "Social Time", "Work", 
+    "Hobbies", "Nature Walk", "Music", "Cooking", "Gaming",
+    "Sleep", "Studying", "Family Time", "Shopping", "Travel"
+]
+ACTIVITY_BITS = {name: 1 << i for i, name in enumerate(ACTIVITIES)}
+
+# Column name -> numpy dtype for a mood entry. 'date' is the full check-in
+# timestamp (int64 nanoseconds) and 'mood' a code into MOOD_EMOJIS; both
+# are only formatted when displayed.
+MOOD_COLUMNS = {
+    'id': np.int64,
+    'date': 'datetime64[ns]',
+    'mood': np.int8,
+    'mood_value': np.int8,
+    'activities': np.uint16,
+    'notes': object,
+    'energy_level': np.int8,
+    'sleep_hours': np.float32
+}
+# In-memory bytes per row (object columns count as one pointer) and the
+# header CPython adds to each note string, for memory accounting
+ROW_BYTES = sum(np.dtype(dtype).itemsize for dtype in MOOD_COLUMNS.values())
+STR_OVERHEAD = 49
+# Once the indexes alone outgrow a store's memory limit, new rows spill in
+# batches of this many instead of one at a time
+OVERFLOW_SPILL_ROWS = 1024
+
+
+def _text_bytes(values):
+    """Approximate memory held by an array of note strings"""
+    return sum(len(value) for value in values if value) + STR_OVERHEAD * len(values)
+
+
+def encode_activities(names):
+    """Pack a list of activity names into a bitmask"""
+    if isinstance(names, (int, np.integer)):
+        return int(names)
+    mask = 0
+    for name in names:
+        mask |= ACTIVITY_BITS[name]
+    return mask
+
+
+def encode_moods(values):
+    """Convert a Series of mood emojis (or a mood Categorical) to int8 codes"""
+    if isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories) == MOOD_EMOJIS:
+        return values.cat.codes.to_numpy(dtype=np.int8)
+    return values.map(MOOD_CODES).to_numpy(dtype=np.int8)
+
+
+def mood_categorical(codes):
+    """Wrap mood codes as a Categorical of emojis without copying them"""
+    return pd.Categorical.from_codes(codes, categories=MOOD_EMOJIS)
+
+
+def decode_activities(mask):
+    """Unpack an activity bitmask into a list of names"""
+    mask = int(mask)
+    return [name for i, name in enumerate(ACTIVITIES) if mask >> i & 1]
+
+
+def encode_activity_column(values):
+    """Pack a Series of activity-name lists into a uint16 mask array"""
+    if np.issubdtype(values.dtype, np.integer):
+        return values.to_numpy(dtype=np.uint16)
+    exploded = values.reset_index(drop=True).explode()
+    bits = exploded.map(ACTIVITY_BITS).fillna(0).to_numpy(dtype=np.uint16)
+    # Each row's items are contiguous; OR them, so a repeated name sets its bit once
+    rows = exploded.index.to_numpy()
+    starts = np.flatnonzero(np.concatenate(([True], rows[1:] != rows[:-1])))
+    return np.bitwise_or.reduceat(bits, starts) if len(bits) else bits
+
+
+def activity_matrix(masks):
+    """Expand masks into a boolean entry x activity matrix"""
+    masks = np.asarray(masks, dtype=np.uint16)
+    return (masks[:, None] >> np.arange(len(ACTIVITIES), dtype=np.uint16)) & 1 == 1
+
+
+def activity_counts(masks):
+    """Count how many entries include each activity"""
+    return pd.Series(activity_matrix(masks).sum(axis=0), index=ACTIVITIES)
+
+
+def activity_co_occurrence(masks):
+    """Count how often each pair of activities is logged in the same entry"""
+    matrix = activity_matrix(masks).astype(np.int32)
+    return pd.DataFrame(matrix.T @ matrix, index=ACTIVITIES, columns=ACTIVITIES)
+
+
+def bucket_start(day, freq):
+    """Return the first day of the week or month bucket containing a date"""
+    day = pd.Timestamp(day).date()
+    if freq == 'week':
+        return day - timedelta(days=day.weekday())
+    if freq == 'month':
+        return day.replace(day=1)
+    raise ValueError(f"unknown bucket frequency: {freq}")
+
+
+def bucket_end(day, freq):
+    """Return the last day of the week or month bucket containing a date"""
+    start = bucket_start(day, freq)
+    if freq == 'week':
+        return start + timedelta(days=6)
+    return (pd.Timestamp(start) + pd.offsets.MonthEnd(0)).date()
+
+
+class DayTable:
+    """Per-day rows of running sums, sorted by day, in growable numpy arrays
+
+    Entries arrive almost always in date order, so updating the newest day
+    or opening a new one is amortized O(1); back-dated days are merged in.
+    With a `count_column`, days whose count drops to zero are dropped, so
+    the table only holds days that still have entries.
+    """
+
+    def __init__(self, width, count_column=-1, capacity=64, dtype=np.float64):
+        self.count_column = count_column
+        self._days = np.empty(capacity, dtype='datetime64[D]')
+        self._values = np.zeros((capacity, width), dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return self._days.nbytes + self._values.nbytes
+
+    def view(self):
+        """Return the (days, values) arrays, oldest day first"""
+        return self._days[:self._size], self._values[:self._size]
+
+    def copy(self):
+        table = DayTable(self._values.shape[1], self.count_column, max(self._size, 1), self._values.dtype)
+        table._days[:self._size], table._values[:self._size] = self.view()
+        table._size = self._size
+        return table
+
+    def _reserve(self, size):
+        capacity = len(self._days)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        days = np.empty(capacity, dtype=self._days.dtype)
+        values = np.zeros((capacity, self._values.shape[1]), dtype=self._values.dtype)
+        days[:self._size], values[:self._size] = self.view()
+        self._days, self._values = days, values
+
+    def add(self, days, rows, sign=1):
+        """Add `sign * rows` to the given days, which must be sorted and unique"""
+        days = np.asarray(days, dtype='datetime64[D]')
+        if not len(days):
+            return
+        rows = sign * np.asarray(rows, dtype=self._values.dtype).reshape(len(days), -1)
+        size = self._size
+        if size and days[0] < self._days[size - 1]:
+            self._merge(days, rows)
+        else:
+            if size and days[0] == self._days[size - 1]:
+                self._values[size - 1] += rows[0]
+                days, rows = days[1:], rows[1:]
+            self._reserve(size + len(days))
+            self._days[size:size + len(days)] = days
+            self._values[size:size + len(days)] = rows
+            self._size += len(days)
+        if self.count_column is not None and sign < 0:
+            self._drop_empty()
+
+    def _merge(self, days, rows):
+        current = self._days[:self._size]
+        positions = np.searchsorted(current, days)
+        found = positions < self._size
+        found[found] = current[positions[found]] == days[found]
+        self._values[positions[found]] += rows[found]
+        if found.all():
+            return
+        merged_days = np.concatenate([current, days[~found]])
+        merged = np.concatenate([self._values[:self._size], rows[~found]])
+        order = np.argsort(merged_days, kind='stable')
+        self._reserve(len(order))
+        self._days[:len(order)] = merged_days[order]
+        self._values[:len(order)] = merged[order]
+        self._size = len(order)
+
+    def _drop_empty(self):
+        days, values = self.view()
+        keep = values[:, self.count_column] > 0
+        if keep.all():
+            return
+        kept = int(keep.sum())
+        self._days[:kept] = days[keep]
+        self._values[:kept] = values[keep]
+        self._size = kept
+
+
+class MoodAggregates:
+    """Running mood statistics kept up to date on every append and delete
+
+    Holds the entry count, mood-value sum, per-mood counts, entries per day
+    and a trailing window of recent mood values, so reading any stat is
+    O(1) no matter how long the history is.
+    """
+
+    def __init__(self, window=7):
+        self.count = 0
+        self.total = 0
+        self.mood_counts = {}
+        # Entries per day
+        self.days = DayTable(1)
+        self.recent = deque(maxlen=window)
+
+    def add(self, entry):
+        """Fold one new entry into the running stats"""
+        day = np.datetime64(entry['date'], 'D')
+        self.count += 1
+        self.total += int(entry['mood_value'])
+        self.mood_counts[entry['mood']] = self.mood_counts.get(entry['mood'], 0) + 1
+        self.days.add([day], [1])
+        self.recent.append(int(entry['mood_value']))
+
+    def add_many(self, df):
+        """Fold a DataFrame of new entries into the running stats"""
+        self.count += len(df)
+        self.total += int(df['mood_value'].sum())
+        for mood, count in df['mood'].value_counts().items():
+            if count:
+                self.mood_counts[mood] = self.mood_counts.get(mood, 0) + int(count)
+        days = df['date'].to_numpy().astype('datetime64[D]')
+        unique_days, counts = np.unique(days, return_counts=True)
+        self.days.add(unique_days, counts)
+        self.recent.extend(int(value) for value in df['mood_value'].to_numpy()[-self.recent.maxlen:])
+
+    def remove(self, entry, recent_values):
+        """Take one deleted entry back out of the running stats
+
+        `recent_values` are the trailing mood values left after the delete,
+        used to refill the trend window.
+        """
+        day = np.datetime64(entry['date'], 'D')
+        self.count -= 1
+        self.total -= int(entry['mood_value'])
+        self.mood_counts[entry['mood']] -= 1
+        if not self.mood_counts[entry['mood']]:
+            del self.mood_counts[entry['mood']]
+        self.days.add([day], [1], sign=-1)
+        self.recent.clear()
+        self.recent.extend(int(value) for value in recent_values[-self.recent.maxlen:])
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def days_tracked(self):
+        return len(self.days)
+
+    @property
+    def most_common_mood(self):
+        if not self.mood_counts:
+            return None
+        # Ties go to the lowest mood key, matching pandas' mode()
+        return min(self.mood_counts, key=lambda mood: (-self.mood_counts[mood], mood))
+
+
+class ActivityMoodStats:
+    """Running sums that relate activities to mood, energy and sleep
+
+    Keeps per-activity counts, sums and sums of squares of each metric over
+    the entry x activity indicator matrix, plus per-day activity counts and
+    mood sums for next-day effects. Appends and deletes adjust the sums, so
+    reading the lift table never rescans the history.
+    """
+
+    METRICS = ['mood_value', 'energy_level', 'sleep_hours']
+
+    def __init__(self):
+        activities, metrics = len(ACTIVITIES), len(self.METRICS)
+        self.count = 0
+        self.totals = np.zeros(metrics)
+        self.squares = np.zeros(metrics)
+        self.with_count = np.zeros(activities)
+        self.with_sum = np.zeros((activities, metrics))
+        self.with_squares = np.zeros((activities, metrics))
+        # Per day: activity counts..., mood sum, entry count. These are small
+        # integers, which float32 holds exactly at half the size
+        self.days = DayTable(activities + 2, dtype=np.float32)
+
+    def _apply(self, masks, values, days, sign):
+        bits = activity_matrix(masks).astype(float)
+        values = np.asarray(values, dtype=float)
+        self.count += sign * len(values)
+        self.totals += sign * values.sum(axis=0)
+        self.squares += sign * (values ** 2).sum(axis=0)
+        self.with_count += sign * bits.sum(axis=0)
+        self.with_sum += sign * (bits.T @ values)
+        self.with_squares += sign * (bits.T @ values ** 2)
+
+        unique_days, positions = np.unique(days, return_inverse=True)
+        per_day = np.zeros((len(unique_days), len(ACTIVITIES) + 2))
+        np.add.at(per_day[:, :-2], positions, bits)
+        np.add.at(per_day[:, -2], positions, values[:, 0])
+        np.add.at(per_day[:, -1], positions, 1)
+        self.days.add(unique_days, per_day, sign)
+
+    def add(self, entry):
+        self._apply([encode_activities(entry['activities'])],
+                    [[entry[metric] for metric in self.METRICS]],
+                    [np.datetime64(entry['date'], 'D')], 1)
+
+    def add_many(self, masks, df):
+        self._apply(masks, df[self.METRICS].to_numpy(dtype=float),
+                    df['date'].to_numpy().astype('datetime64[D]'), 1)
+
+    def remove(self, entry):
+        self._apply([encode_activities(entry['activities'])],
+                    [[entry[metric] for metric in self.METRICS]],
+                    [np.datetime64(entry['date'], 'D')], -1)
+
+    def lift(self, z=1.96):
+        """Return per-activity differences in mean metrics with vs. without the activity
+
+        Includes a confidence interval (normal approximation) for the mood
+        lift and the next-day mood lift from the per-day sums.
+        """
+        n_with = self.with_count
+        n_without = self.count - n_with
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_with = self.with_sum / n_with[:, None]
+            mean_without = (self.totals - self.with_sum) / n_without[:, None]
+            var_with = (self.with_squares - self.with_sum ** 2 / n_with[:, None]) / (n_with[:, None] - 1)
+            rest_sum = self.totals - self.with_sum
+            rest_squares = self.squares - self.with_squares
+            var_without = (rest_squares - rest_sum ** 2 / n_without[:, None]) / (n_without[:, None] - 1)
+            margin = z * np.sqrt(var_with[:, 0] / n_with + var_without[:, 0] / n_without)
+        lift = mean_with - mean_without
+        return pd.DataFrame({
+            'entries': n_with.astype(int),
+            'mood_with': mean_with[:, 0],
+            'mood_without': mean_without[:, 0],
+            'mood_lift': lift[:, 0],
+            'ci_low': lift[:, 0] - margin,
+            'ci_high': lift[:, 0] + margin,
+            'energy_lift': lift[:, 1],
+            'sleep_lift': lift[:, 2],
+            'next_day_lift': self.next_day_lift()
+        }, index=ACTIVITIES)
+
+    def next_day_lift(self):
+        """Mean mood on the day after an activity minus the day after other days"""
+        lifts = np.full(len(ACTIVITIES), np.nan)
+        if len(self.days) < 2:
+            return lifts
+        days, table = self.days.view()
+        table = table.astype(float)
+        mood = table[:, -2] / table[:, -1]
+        # Pairs of consecutive calendar days that both have entries
+        has_next = (days[1:] - days[:-1]) == np.timedelta64(1, 'D')
+        did = table[:-1, :-2][has_next] > 0
+        next_mood = mood[1:][has_next]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            after = (did * next_mood[:, None]).sum(axis=0) / did.sum(axis=0)
+            after_other = (~did * next_mood[:, None]).sum(axis=0) / (~did).sum(axis=0)
+        lifts[:] = after - after_other
+        return lifts
+
+
+class MoodForecast:
+    """Streaming mood smoothing and next-day forecast
+
+    Daily mean moods are folded into Holt's linear exponential smoothing
+    (level plus trend) and an exponentially weighted variance of the
+    one-step errors, alongside a rolling mean over the last `window`
+    calendar days (days without entries count toward the window).
+    Each new entry costs O(1); deletes and back-dated entries rebuild from
+    the per-day sums, one step per day.
+    """
+
+    def __init__(self, alpha=0.3, beta=0.1, window=7):
+        self.alpha = alpha
+        self.beta = beta
+        self.level = None
+        self.trend = 0.0
+        self.variance = 0.0
+        self.window = window
+        # (day, mean) of the completed days inside the window
+        self.rolling = deque()
+        # Smoothed level after each completed day, for chart overlays
+        self.smoothed = DayTable(1, count_column=None)
+        self.day = None
+        self._day_sum = 0.0
+        self._day_count = 0
+
+    def _step(self, mean, level, trend, variance):
+        """Return the state after folding in one day's mean"""
+        if level is None:
+            return mean, 0.0, 0.0
+        predicted = level + trend
+        error = mean - predicted
+        variance = (1 - self.alpha) * (variance + self.alpha * error ** 2)
+        new_level = self.alpha * mean + (1 - self.alpha) * predicted
+        trend = self.beta * (new_level - level) + (1 - self.beta) * trend
+        return new_level, trend, variance
+
+    def _fold(self, day, mean):
+        """Fold in a completed day's mean and return the new level"""
+        self.level, self.trend, self.variance = self._step(mean, self.level, self.trend, self.variance)
+        self.rolling.append((day, mean))
+        self._trim(day)
+        return self.level
+
+    def _trim(self, day):
+        """Drop days that fall outside the window ending on `day`"""
+        while self.rolling and self.rolling[0][0] <= day - self.window:
+            self.rolling.popleft()
+
+    def _close_day(self):
+        self.smoothed.add([self.day], [self._fold(self.day, self._day_sum / self._day_count)])
+
+    def _open_day(self, day, total=0.0, count=0):
+        self.day = day
+        self._day_sum = total
+        self._day_count = count
+        self._trim(day)
+
+    def add(self, day, value):
+        """Fold in one entry; returns False if it is older than the current day"""
+        day = np.datetime64(day, 'D')
+        if self.day is not None and day < self.day:
+            return False
+        if day != self.day:
+            if self.day is not None:
+                self._close_day()
+            self._open_day(day)
+        self._day_sum += float(value)
+        self._day_count += 1
+        return True
+
+    def add_days(self, days, sums, counts):
+        """Fold in per-day mood sums and entry counts for sorted, unique days
+
+        Costs one step per day rather than per entry. Returns False if the
+        first day is older than the current day.
+        """
+        days = np.asarray(days, dtype='datetime64[D]')
+        if not len(days):
+            return True
+        if self.day is not None and days[0] < self.day:
+            return False
+        sums, counts = np.asarray(sums, dtype=float), np.asarray(counts, dtype=np.int64)
+        if days[0] == self.day:
+            self._day_sum += float(sums[0])
+            self._day_count += int(counts[0])
+            days, sums, counts = days[1:], sums[1:], counts[1:]
+            if not len(days):
+                return True
+        closed, levels = list(days[:-1]), []
+        if self.day is not None:
+            closed.insert(0, self.day)
+            levels.append(self._fold(self.day, self._day_sum / self._day_count))
+        for day, mean in zip(days[:-1], (sums[:-1] / counts[:-1]).tolist()):
+            levels.append(self._fold(day, mean))
+        self.smoothed.add(closed, levels)
+        self._open_day(days[-1], float(sums[-1]), int(counts[-1]))
+        return True
+
+    def snapshot(self):
+        """Return an independent copy that later updates do not touch"""
+        frozen = copy.copy(self)
+        frozen.rolling = deque(self.rolling)
+        frozen.smoothed = self.smoothed.copy()
+        return frozen
+
+    def rebuild(self, days, sums, counts):
+        """Reset and replay from per-day mood sums and entry counts"""
+        self.__init__(self.alpha, self.beta, self.window)
+        self.add_days(days, sums, counts)
+
+    def current(self):
+        """Return (level, trend, variance, rolling mean) including the day in progress"""
+        if self.day is None:
+            return None
+        mean = self._day_sum / self._day_count
+        level, trend, variance = self._step(mean, self.level, self.trend, self.variance)
+        # The window ends on the day in progress; older days were trimmed when it opened
+        recent = [day_mean for _, day_mean in self.rolling]
+        return level, trend, variance, (sum(recent) + mean) / (len(recent) + 1)
+
+    def predict(self, z=1.96):
+        """Forecast the next day's mood as (day, value, low, high), clipped to 1-5"""
+        state = self.current()
+        if state is None:
+            return None
+        level, trend, variance, _ = state
+        value = level + trend
+        margin = z * np.sqrt(variance)
+        return (self.day + 1, float(np.clip(value, 1, 5)),
+                float(np.clip(value - margin, 1, 5)), float(np.clip(value + margin, 1, 5)))
+
+    def series(self):
+        """Return the smoothed level per day, including the day in progress"""
+        days, levels = self.smoothed.view()
+        points = list(zip(days, levels[:, 0].tolist()))
+        if self.day is not None:
+            points.append((self.day, self.current()[0]))
+        return points
+
+
+class MoodSnapshot:
+    """Fixed-width columns of some MoodStore rows, frozen for another thread
+
+    Taking one copies only the in-memory rows. Spilled rows are read when
+    the frame is built, through the segment's record map as it was at
+    snapshot time; spills only append and deletes write a new file, so
+    that map never changes underneath. Notes are left out.
+    """
+
+    __slots__ = ('rows', '_cold', '_records', '_hot')
+
+    def __init__(self, rows, cold, records, hot):
+        self.rows = rows
+        self._cold = cold
+        self._records = records
+        self._hot = hot
+
+    def __len__(self):
+        return len(self.rows)
+
+    def frame(self):
+        """Return the rows as a DataFrame, like MoodStore.take without notes"""
+        cold_rows = self.rows[self._cold]
+        columns = {}
+        for name, hot in self._hot.items():
+            values = np.empty(len(self.rows), dtype=hot.dtype)
+            if len(cold_rows):
+                values[self._cold] = self._records[name][cold_rows]
+            values[~self._cold] = hot
+            columns[name] = values
+        return MoodStore._to_frame(columns, self.rows)
+
+
+class MoodStore:
+    """Columnar, append-optimized storage for mood entries
+
+    Each column is a numpy array with spare capacity that doubles when full,
+    so appends are amortized O(1). Pages read the data through `frame()`,
+    which is built once per change and shared until the next write, and
+    summary numbers through `stats`, which is updated incrementally.
+    A date-sorted row index answers date ranges by binary search, and mood
+    filters are one vectorized scan of the int8 mood code column.
+
+    With a `memory_limit` (bytes) the store is tiered. The date index
+    (16 bytes per entry) and the per-day aggregate tables always stay in
+    memory; once they plus the in-memory rows and notes outgrow the limit,
+    the oldest rows spill to an on-disk MoodSegment until the rows use
+    half of what the resident structures leave free. Row indexes stay
+    global, and rows below `cold_rows` are read back from disk only when a
+    query touches them. If the resident structures alone outgrow the
+    limit, `over_limit` turns True, a warning is logged, and new rows
+    spill in batches of OVERFLOW_SPILL_ROWS.
+    """
+
+    def __init__(self, capacity=64, memory_limit=None, segment_dir=SEGMENT_DIR):
+        self._size = 0
+        self.memory_limit = memory_limit
+        self._segment_dir = segment_dir
+        self._segment = None
+        # Rows [0, _cold) live in the segment; _columns holds the rest
+        self._cold = 0
+        self._notes_bytes = 0
+        self.over_limit = False
+        self.stats = MoodAggregates()
+        self.activity_stats = ActivityMoodStats()
+        self.forecast = MoodForecast()
+        self._columns = {name: np.empty(capacity, dtype=dtype)
+                         for name, dtype in MOOD_COLUMNS.items()}
+        # Identifies this store's data in caches shared across sessions
+        self.token = uuid.uuid4().hex
+        self.version = 0
+        self._frame = None
+        self._frame_version = -1
+        # Row indexes in date order, and their dates, for range queries
+        self._date_rows = np.empty(capacity, dtype=np.int32)
+        self._date_keys = np.empty(capacity, dtype='datetime64[ns]')
+        self._date_sorted = True
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    @property
+    def cold_rows(self):
+        """Number of rows that have spilled to disk"""
+        return self._cold
+
+    def resident_bytes(self):
+        """Bytes held by the structures that never spill: date index and per-day tables"""
+        return (self._date_rows.nbytes + self._date_keys.nbytes + self.stats.days.nbytes
+                + self.activity_stats.days.nbytes + self.forecast.smoothed.nbytes)
+
+    def memory_usage(self):
+        """Approximate bytes held in memory by hot rows, their notes and the resident structures"""
+        return len(self._columns['date']) * ROW_BYTES + self._notes_bytes + self.resident_bytes()
+
+    def _grow(self, needed):
+        """Make room for `needed` rows in total"""
+        hot = self._size - self._cold
+        capacity = len(self._columns['date'])
+        if needed - self._cold > capacity:
+            while capacity < needed - self._cold:
+                capacity *= 2
+            for name, column in self._columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:hot] = column[:hot]
+                self._columns[name] = grown
+        capacity = len(self._date_rows)
+        if needed > capacity:
+            # The index is resident for every entry, so it grows more gently
+            while capacity < needed:
+                capacity += capacity // 2
+            for name in ('_date_rows', '_date_keys'):
+                index = getattr(self, name)
+                grown = np.empty(capacity, dtype=index.dtype)
+                grown[:self._size] = index[:self._size]
+                setattr(self, name, grown)
+
+    def _enforce_limit(self):
+        """Spill the oldest rows to disk if memory use is over the limit"""
+        if self.memory_limit is None or self.memory_usage() <= self.memory_limit:
+            return
+        hot = self._size - self._cold
+        free = self.memory_limit - self.resident_bytes()
+        if free <= 0:
+            if not self.over_limit:
+                logger.warning("Mood indexes use %.1f MB, over the %.1f MB session limit; "
+                               "keeping new entries on disk", self.resident_bytes() / 2 ** 20,
+                               self.memory_limit / 2 ** 20)
+                self.over_limit = True
+            if hot >= OVERFLOW_SPILL_ROWS:
+                self._spill(hot)
+            return
+        self.over_limit = False
+        notes = self._columns['notes'][:hot]
+        sizes = ROW_BYTES + STR_OVERHEAD + np.fromiter(
+            (len(note) if note else 0 for note in notes), dtype=np.int64, count=hot)
+        # Keep the newest rows that fit in half the free memory, so spills stay rare
+        keep = int(np.searchsorted(np.cumsum(sizes[::-1]), free // 2, side='right'))
+        self._spill(hot - keep)
+
+    def _spill(self, count):
+        """Move the `count` oldest in-memory rows to the on-disk segment"""
+        if count <= 0:
+            return
+        if self._segment is None:
+            self._segment = MoodSegment(MOOD_COLUMNS, self.token, self._segment_dir)
+        hot = self._size - self._cold
+        self._segment.append({name: column[:count] for name, column in self._columns.items()})
+        self._notes_bytes -= _text_bytes(self._columns['notes'][:count])
+        capacity = max(64, hot - count)
+        for name, column in self._columns.items():
+            kept = np.empty(capacity, dtype=column.dtype)
+            kept[:hot - count] = column[count:hot]
+            self._columns[name] = kept
+        self._cold += count
+
+    def _values(self, name, rows=None):
+        """Return one column for the given rows (all if None), reading spilled rows from disk"""
+        hot = self._columns[name][:self._size - self._cold]
+        if rows is None:
+            return np.concatenate([self._segment.read(name), hot]) if self._cold else hot
+        if not self._cold:
+            return hot[rows]
+        rows = np.asarray(rows, dtype=np.int64)
+        values = np.empty(len(rows), dtype=hot.dtype)
+        cold = rows < self._cold
+        values[cold] = self._segment.read(name, rows[cold])
+        values[~cold] = hot[rows[~cold] - self._cold]
+        return values
+
+    def append(self, entry):
+        """Append one entry dict and return its row index"""
+        self._grow(self._size + 1)
+        row = self._size
+        position = row - self._cold
+        for name, column in self._columns.items():
+            value = entry[name]
+            if name == 'date':
+                value = np.datetime64(value, 'ns')
+            elif name == 'mood':
+                value = MOOD_CODES[value]
+            elif name == 'activities':
+                value = encode_activities(value)
+            column[position] = value
+        self._size += 1
+        self.version += 1
+        self._notes_bytes += _text_bytes([entry['notes']])
+        self.stats.add(entry)
+        self.activity_stats.add(entry)
+        self._index_row(row)
+        if not self.forecast.add(self._columns['date'][position], entry['mood_value']):
+            self._rebuild_forecast()
+        self._enforce_limit()
+        return row
+
+    def extend(self, df):
+        """Append a DataFrame of entries (one column per MOOD_COLUMNS key) in bulk"""
+        count = len(df)
+        if not count:
+            return
+        start = self._size
+        self._grow(start + count)
+        hot = slice(start - self._cold, start - self._cold + count)
+        for name, column in self._columns.items():
+            values = df[name].to_numpy()
+            if name == 'date':
+                values = values.astype('datetime64[ns]')
+            elif name == 'mood':
+                values = encode_moods(df[name])
+            elif name == 'activities':
+                values = encode_activity_column(df[name])
+            column[hot] = values
+        self._size += count
+        self.version += 1
+        self._notes_bytes += _text_bytes(self._columns['notes'][hot])
+        self.stats.add_many(df)
+        self.activity_stats.add_many(self._columns['activities'][hot], df)
+
+        dates = self._columns['date'][hot]
+        if (start and dates.min() < self._date_keys[start - 1]) or np.any(dates[1:] < dates[:-1]):
+            self._date_sorted = False
+        self._date_keys[start:start + count] = dates
+        self._date_rows[start:start + count] = np.arange(start, start + count)
+
+        if self._date_sorted:
+            days, starts = np.unique(dates.astype('datetime64[D]'), return_index=True)
+            sums = np.add.reduceat(self._columns['mood_value'][hot].astype(float), starts)
+            if not self.forecast.add_days(days, sums, np.diff(np.append(starts, count))):
+                self._rebuild_forecast()
+        else:
+            self._rebuild_forecast()
+        self._enforce_limit()
+
+    def _index_row(self, row):
+        date = self._columns['date'][row - self._cold]
+        # Entries normally arrive in date order; anything older re-sorts lazily
+        if row and date < self._date_keys[row - 1]:
+            self._date_sorted = False
+        self._date_keys[row] = date
+        self._date_rows[row] = row
+
+    def _rebuild_forecast(self):
+        # The activity table already keeps each day's mood sum and count
+        days, table = self.activity_stats.days.view()
+        self.forecast.rebuild(days, table[:, -2], table[:, -1])
+
+    def _sorted_dates(self):
+        if not self._date_sorted:
+            dates = self._values('date')
+            order = np.argsort(dates, kind='stable')
+            self._date_rows[:self._size] = order
+            self._date_keys[:self._size] = dates[order]
+            self._date_sorted = True
+        return self._date_keys[:self._size], self._date_rows[:self._size]
+
+    def delete(self, row):
+        """Remove the entry at a row index and return it as a dict"""
+        if not 0 <= row < self._size:
+            raise IndexError(f"mood entry {row} out of range")
+        entry = self.row(row)
+        if row < self._cold:
+            self._segment.delete(row)
+            self._cold -= 1
+        else:
+            position, hot = row - self._cold, self._size - self._cold
+            for column in self._columns.values():
+                column[position:hot - 1] = column[position + 1:hot]
+                if column.dtype == object:
+                    column[hot - 1] = None
+            self._notes_bytes -= _text_bytes([entry['notes']])
+        self._size -= 1
+        self.version += 1
+        recent = np.arange(max(0, self._size - self.stats.recent.maxlen), self._size)
+        self.stats.remove(entry, self._values('mood_value', recent))
+        self.activity_stats.remove(entry)
+        # Rows after the deleted one shifted down, so the date index is stale
+        self._date_sorted = False
+        self._rebuild_forecast()
+        return entry
+
+    def row_of(self, entry_id):
+        """Return the row index of an entry id (ids increase with row order)"""
+        ids, base = self._columns['id'][:self._size - self._cold], self._cold
+        if self._cold and (not len(ids) or entry_id < ids[0]):
+            # Binary search over the mapped id column pages in only a few blocks
+            ids, base = self._segment.read('id'), 0
+        row = int(np.searchsorted(ids, entry_id))
+        if row == len(ids) or ids[row] != entry_id:
+            raise KeyError(entry_id)
+        return base + row
+
+    def column(self, name):
+        """Return a read-only array of one column, including spilled rows"""
+        view = self._values(name)
+        view.flags.writeable = False
+        return view
+
+    def row(self, row):
+        """Return one entry as a dict"""
+        rows = np.array([row])
+        entry = {name: self._values(name, rows)[0] for name in self._columns}
+        entry['date'] = pd.Timestamp(entry['date'])
+        entry['mood'] = MOOD_EMOJIS[entry['mood']]
+        return entry
+
+    def date_span(self, start=None, end=None):
+        """Return the row indexes dated within [start, end], in date order
+
+        Both bounds are inclusive days and either may be None. The bounds are
+        located by binary search over the sorted date index.
+        """
+        keys, rows = self._sorted_dates()
+        lo = 0 if start is None else np.searchsorted(
+            keys, np.datetime64(start, 'D').astype('datetime64[ns]'), side='left')
+        hi = len(keys) if end is None else np.searchsorted(
+            keys, (np.datetime64(end, 'D') + 1).astype('datetime64[ns]'), side='left')
+        return rows[lo:hi].copy()
+
+    def select(self, start=None, end=None, moods=None, activities=None):
+        """Return the row indexes matching the filters, in date order
+
+        `activities` keeps entries that include any of the named activities,
+        checked with one bitwise AND over the mask column.
+        """
+        codes = [MOOD_CODES[mood] for mood in moods or []]
+        if start is not None or end is not None:
+            rows = self.date_span(start, end)
+            if codes:
+                rows = rows[np.isin(self._values('mood', rows), codes)]
+        elif codes:
+            mood_rows = np.flatnonzero(np.isin(self._values('mood'), codes))
+            rows = mood_rows[np.argsort(self._values('date', mood_rows), kind='stable')]
+        else:
+            rows = self.date_span()
+        if activities:
+            wanted = np.uint16(encode_activities(activities))
+            rows = rows[(self._values('activities', rows) & wanted) != 0]
+        return rows
+
+    @staticmethod
+    def _to_frame(columns, index=None):
+        columns['mood'] = mood_categorical(columns['mood'])
+        return pd.DataFrame(columns, index=index, copy=False)
+
+    def take(self, rows):
+        """Return a DataFrame holding only the given rows"""
+        return self._to_frame({name: self._values(name, rows) for name in self._columns}, rows)
+
+    def snapshot(self, rows):
+        """Return a MoodSnapshot of the given rows that later writes do not change"""
+        rows = np.asarray(rows)
+        cold = rows < self._cold
+        hot_rows = rows[~cold] - self._cold
+        hot = {name: column[hot_rows] for name, column in self._columns.items() if column.dtype != object}
+        return MoodSnapshot(rows, cold, self._segment.records() if self._cold else None, hot)
+
+    def frame(self):
+        """Return a DataFrame over the stored entries
+
+        While every row is in memory the frame is cached until the next
+        write. Once rows have spilled it is built per call from the segment,
+        so holding it never pins the cold tier in memory.
+        """
+        if self._cold:
+            self._frame, self._frame_version = None, -1
+            return self._to_frame({name: self._values(name) for name in self._columns})
+        if self._frame_version != self.version:
+            self._frame = self._to_frame({name: self.column(name) for name in self._columns})
+            self._frame_version = self.version
+        return self._frame
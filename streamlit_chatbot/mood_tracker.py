@@ -1,10 +1,16 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import random
 import json
+from mood_store import MoodStore, MOODS, ACTIVITIES, bucket_start, bucket_end, decode_activities
+from mood_storage import DB_PATH, DEFAULT_USER, SAVE_SIGNED_OUT, SQLiteService, WriteError, open_backend
+from mood_segments import session_memory_limits
+from diary_store import DiaryEntry, DiarySearchIndex, DiaryStore
+from mood_export import EXPORT_FORMATS, export_moods
+from mood_import import IMPORT_TYPES, read_upload, validate_moods
+from mood_analytics import AnalyticsWorker, FigureCache, RESOLUTIONS
+from mood_content import APP_CSS, SONG_RECOMMENDATIONS, WELLNESS_TIPS
 
 # Configure page
 st.set_page_config(
@@ -13,220 +19,81 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
-# Custom CSS for Times New Roman font
-st.markdown("""
-<style>
-    /* Apply Times New Roman to all text elements */
-    .stApp, .stApp * {
-        font-family: 'Times New Roman', Times, serif !important;
-    }
-    
-    /* Specific styling for different elements */
-    h1, h2, h3, h4, h5, h6 {
-        font-family: 'Times New Roman', Times, serif !important;
-    }
-    
-    .stSelectbox label, .stTextInput label, .stTextArea label, 
-    .stSlider label, .stNumberInput label, .stMultiSelect label,
-    .stRadio label, .stCheckbox label {
-        font-family: 'Times New Roman', Times, serif !important;
-    }
-    
-    .stButton button {
-        font-family: 'Times New Roman', Times, serif !important;
-    }
-    
-    .stMarkdown, .stText {
-        font-family: 'Times New Roman', Times, serif !important;
-    }
-    
-    .stSidebar * {
-        font-family: 'Times New Roman', Times, serif !important;
-    }
-    
-    /* Form elements */
-    input, textarea, select {
-        font-family: 'Times New Roman', Times, serif !important;
-    }
-    
-    /* Metrics and other components */
-    .metric-container, .stMetric {
-        font-family: 'Times New Roman', Times, serif !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for Times New Roman font, built once in mood_content
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+@st.cache_resource
+def get_data_service():
+    """Process-wide database service: pooled readers and one batched writer"""
+    return SQLiteService(DB_PATH)
+
+def current_user():
+    """Return the signed-in account whose data this session reads and writes
+
+    Identity comes only from Streamlit authentication (st.login). Without
+    a signed-in user this returns None, and the session keeps its data
+    to itself in memory rather than sharing a saved bucket with every
+    other anonymous visitor, unless the deployment opted in with
+    MOOD_TRACKER_DEFAULT_USER, which saves them under DEFAULT_USER.
+    """
+    user = getattr(st, "user", None)
+    if user is None or not user.get("is_logged_in"):
+        return DEFAULT_USER if SAVE_SIGNED_OUT else None
+    return f"account:{user.get('sub') or user.get('email')}"
 
 # Initialize session state for data storage
-if 'mood_data' not in st.session_state:
-    st.session_state.mood_data = []
+if 'mood_store' not in st.session_state:
+    st.session_state.mood_limit, st.session_state.diary_limit = session_memory_limits()
+    st.session_state.mood_store = MoodStore(memory_limit=st.session_state.mood_limit)
+    st.session_state.backend = open_backend(st.session_state.mood_store, current_user(), get_data_service)
+    st.session_state.mood_store.extend(st.session_state.backend.load_moods())
 if 'wellness_data' not in st.session_state:
-    st.session_state.wellness_data = []
+    st.session_state.wellness_data = st.session_state.backend.load_wellness()
 if 'selected_mood' not in st.session_state:
     st.session_state.selected_mood = None
 if 'show_form' not in st.session_state:
     st.session_state.show_form = False
 if 'diary_entries' not in st.session_state:
-    st.session_state.diary_entries = []
+    # The store keeps the search index in step and counts it against the limit
+    st.session_state.diary_index = DiarySearchIndex()
+    st.session_state.diary_entries = DiaryStore(st.session_state.backend.load_diary(),
+                                                memory_limit=st.session_state.diary_limit,
+                                                search_index=st.session_state.diary_index)
 
-# Mood and wellness dictionaries
-MOODS = {
-    "😊": {"name": "Happy", "value": 5, "color": "#4CAF50"},
-    "😄": {"name": "Excited", "value": 4, "color": "#FF9800"},
-    "😐": {"name": "Neutral", "value": 3, "color": "#9E9E9E"},
-    "😔": {"name": "Sad", "value": 2, "color": "#2196F3"},
-    "😡": {"name": "Angry", "value": 1, "color": "#F44336"},
-    "😰": {"name": "Anxious", "value": 1, "color": "#9C27B0"},
-    "😴": {"name": "Tired", "value": 2, "color": "#607D8B"}
+# Analytics time periods -> number of days, a calendar bucket, or None for all time
+ANALYTICS_PERIODS = {
+    "All time": None,
+    "This week": "week",
+    "This month": "month",
+    "Last 7 days": 7,
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+    "Last year": 365
 }
 
-ACTIVITIES = [
-    "Exercise", "Meditation", "Reading", "Social Time", "Work", 
-    "Hobbies", "Nature Walk", "Music", "Cooking", "Gaming",
-    "Sleep", "Studying", "Family Time", "Shopping", "Travel"
-]
+HISTORY_PAGE_SIZES = [10, 25, 50, 100]
+# Diary search results shown per page
+DIARY_SEARCH_PAGE_SIZE = 25
 
-WELLNESS_TIPS = {
-    1: [
-        "Try deep breathing exercises for 5 minutes",
-        "Take a short walk outside",
-        "Listen to calming music",
-        "Call a friend or family member",
-        "Practice gratitude by writing 3 things you're thankful for"
-    ],
-    2: [
-        "Engage in light physical activity",
-        "Try a new hobby or creative activity",
-        "Watch something funny or uplifting",
-        "Take a warm bath or shower",
-        "Practice mindfulness meditation"
-    ],
-    3: [
-        "Set small, achievable goals for the day",
-        "Try a new recipe or meal",
-        "Organize your living space",
-        "Connect with nature",
-        "Practice a skill you want to improve"
-    ],
-    4: [
-        "Channel your energy into a workout",
-        "Share your enthusiasm with others",
-        "Start a new project or challenge",
-        "Celebrate your achievements",
-        "Help someone else with their goals"
-    ],
-    5: [
-        "Spread positivity to others",
-        "Reflect on what's going well",
-        "Plan something to look forward to",
-        "Take photos of beautiful moments",
-        "Practice acts of kindness"
-    ]
-}
-
-SONG_RECOMMENDATIONS = {
-    "😊": {  # Happy
-        "genre": "Uplifting Pop",
-        "songs": [
-            "Happy - Pharrell Williams",
-            "Good 4 U - Olivia Rodrigo",
-            "Sunflower - Post Malone",
-            "Can't Stop the Feeling - Justin Timberlake",
-            "Walking on Sunshine - Katrina & The Waves",
-            "Feel Good Inc. - Gorillaz",
-            "Uptown Funk - Bruno Mars"
-        ]
-    },
-    "😄": {  # Excited
-        "genre": "High Energy",
-        "songs": [
-            "Thunder - Imagine Dragons",
-            "Stronger - Kelly Clarkson",
-            "Roar - Katy Perry",
-            "Pump It - Black Eyed Peas",
-            "Eye of the Tiger - Survivor",
-            "Don't Stop Me Now - Queen",
-            "High Hopes - Panic! At The Disco"
-        ]
-    },
-    "😐": {  # Neutral
-        "genre": "Chill Vibes",
-        "songs": [
-            "Blinding Lights - The Weeknd",
-            "Watermelon Sugar - Harry Styles",
-            "Levitating - Dua Lipa",
-            "Heat Waves - Glass Animals",
-            "Stay - The Kid LAROI & Justin Bieber",
-            "Peaches - Justin Bieber",
-            "Good Days - SZA"
-        ]
-    },
-    "😔": {  # Sad
-        "genre": "Comforting & Healing",
-        "songs": [
-            "Someone Like You - Adele",
-            "Fix You - Coldplay",
-            "The Sound of Silence - Simon & Garfunkel",
-            "Mad World - Gary Jules",
-            "Hurt - Johnny Cash",
-            "Breathe Me - Sia",
-            "Skinny Love - Bon Iver"
-        ]
-    },
-    "😡": {  # Angry
-        "genre": "Release & Rock",
-        "songs": [
-            "Stressed Out - Twenty One Pilots",
-            "In the End - Linkin Park",
-            "Somebody That I Used to Know - Gotye",
-            "Counting Stars - OneRepublic",
-            "Radioactive - Imagine Dragons",
-            "Numb - Linkin Park",
-            "Breaking the Habit - Linkin Park"
-        ]
-    },
-    "😰": {  # Anxious
-        "genre": "Calming & Peaceful",
-        "songs": [
-            "Weightless - Marconi Union",
-            "Clair de Lune - Claude Debussy",
-            "Aqueous Transmission - Incubus",
-            "Spiegel im Spiegel - Arvo Pärt",
-            "River - Joni Mitchell",
-            "The Night We Met - Lord Huron",
-            "Holocene - Bon Iver"
-        ]
-    },
-    "😴": {  # Tired
-        "genre": "Gentle & Soothing",
-        "songs": [
-            "Sleep Baby Sleep - Broods",
-            "Dream a Little Dream - Ella Fitzgerald",  
-            "La Vie En Rose - Édith Piaf",
-            "Moonlight Sonata - Beethoven",
-            "Sleepyhead - Passion Pit",
-            "Lullaby - Brahms",
-            "Weightless - Marconi Union"
-        ]
-    }
-}
+# Seconds the Analytics page waits for an in-flight background refresh
+# before building its figures itself
+ANALYTICS_WAIT_SECONDS = 5
 
 def add_diary_entry(title, content, mood=None):
     """Add a new diary entry to session state"""
-    entry = {
-        'date': datetime.now().strftime('%Y-%m-%d'),
-        'time': datetime.now().strftime('%H:%M'),
-        'title': title,
-        'content': content,
-        'mood': mood,
-        'word_count': len(content.split()) if content else 0
-    }
-    st.session_state.diary_entries.append(entry)
+    entry = DiaryEntry(None, datetime.now(), title, content, mood)
+    entry.id = st.session_state.backend.add_diary(entry)
+    st.session_state.diary_entries.add(entry)
+
+def delete_diary_entry(entry_id):
+    """Remove a diary entry from session state"""
+    st.session_state.diary_entries.remove(entry_id)
+    st.session_state.backend.delete_diary(entry_id)
 
 def add_mood_entry(mood, activities, notes, energy_level, sleep_hours):
     """Add a new mood entry to session state"""
     entry = {
-        'date': datetime.now().strftime('%Y-%m-%d'),
-        'time': datetime.now().strftime('%H:%M'),
+        'date': datetime.now(),
         'mood': mood,
         'mood_value': MOODS[mood]['value'],
         'activities': activities,
@@ -234,18 +101,61 @@ def add_mood_entry(mood, activities, notes, energy_level, sleep_hours):
         'energy_level': energy_level,
         'sleep_hours': sleep_hours
     }
-    st.session_state.mood_data.append(entry)
+    entry['id'] = st.session_state.backend.add_mood(entry)
+    st.session_state.mood_store.append(entry)
+    schedule_analytics_refresh()
+
+def import_mood_entries(df):
+    """Bulk-append validated mood entries to session state"""
+    df['id'] = st.session_state.backend.add_moods(df)
+    st.session_state.mood_store.extend(df)
+    schedule_analytics_refresh()
+
+def delete_mood_entry(entry_id):
+    """Remove a mood entry from storage, and from session state if this session holds it"""
+    store = st.session_state.mood_store
+    st.session_state.backend.delete_mood(entry_id)
+    try:
+        row = store.row_of(entry_id)
+    except KeyError:
+        # Saved by another session of the same user after this one loaded;
+        # History lists it from storage, but the session store never had it
+        return
+    store.delete(row)
+    schedule_analytics_refresh()
+
+def query_moods(start=None, end=None, moods=None, activities=None, limit=None, offset=0, newest_first=False):
+    """Return mood entries dated within [start, end] matching the filters, read from storage"""
+    return st.session_state.backend.query_moods(start=start, end=end, moods=moods, activities=activities,
+                                                limit=limit, offset=offset, newest_first=newest_first)
+
+def count_moods(start=None, end=None, moods=None, activities=None):
+    """Count mood entries dated within [start, end] matching the filters
+
+    Always counted in storage, like the History pages it sizes, since
+    storage also holds entries other sessions of this user saved later.
+    """
+    return st.session_state.backend.count_moods(start=start, end=end, moods=moods, activities=activities)
+
+def period_range(period):
+    """Return the (start, end) dates covered by an Analytics time period"""
+    span = ANALYTICS_PERIODS[period]
+    today = datetime.now().date()
+    if span is None:
+        return None, None
+    if isinstance(span, str):
+        return bucket_start(today, span), bucket_end(today, span)
+    return today - timedelta(days=span - 1), today
 
 def get_mood_insights():
     """Generate insights from mood data"""
-    if not st.session_state.mood_data:
+    if not st.session_state.mood_store:
         return "No data available yet. Start tracking your mood!"
     
-    df = pd.DataFrame(st.session_state.mood_data)
-    df['date'] = pd.to_datetime(df['date'])
+    stats = st.session_state.mood_store.stats
     
     # Recent mood trend
-    recent_moods = df.tail(7)['mood_value'].tolist()
+    recent_moods = list(stats.recent)
     if len(recent_moods) >= 2:
         if recent_moods[-1] > recent_moods[-2]:
             trend = "📈 Your mood is trending upward!"
@@ -257,10 +167,15 @@ def get_mood_insights():
         trend = "Need more data to identify trends."
     
     # Most frequent mood
-    most_common_mood = df['mood'].mode().iloc[0] if not df.empty else "😊"
+    most_common_mood = stats.most_common_mood or "😊"
     
     # Average mood
-    avg_mood = df['mood_value'].mean() if not df.empty else 3
+    avg_mood = stats.mean if stats.count else 3
+    
+    # Smoothed mood and tomorrow's forecast
+    forecast = st.session_state.mood_store.forecast
+    smoothed, _, _, rolling_mean = forecast.current()
+    next_day, predicted, low, high = forecast.predict()
     
     insights = f"""
     **Recent Trend**: {trend}
@@ -269,59 +184,77 @@ def get_mood_insights():
     
     **Average Mood Score**: {avg_mood:.1f}/5
     
-    **Total Entries**: {len(df)}
+    **Smoothed Mood**: {smoothed:.1f}/5 (7-day average {rolling_mean:.1f}/5)
+    
+    **Forecast for {pd.Timestamp(next_day).strftime('%B %d')}**: {predicted:.1f}/5 (likely {low:.1f}-{high:.1f})
+    
+    **Total Entries**: {stats.count}
     """
     
     return insights
 
-def create_mood_chart():
-    """Create mood trend chart"""
-    if not st.session_state.mood_data:
-        return None
-    
-    df = pd.DataFrame(st.session_state.mood_data)
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date')
-    
-    fig = px.line(df, x='date', y='mood_value', 
-                  title='Mood Trend Over Time',
-                  labels={'mood_value': 'Mood Score', 'date': 'Date'},
-                  line_shape='spline')
-    
-    fig.update_layout(
-        yaxis=dict(range=[0, 6], tickmode='linear', tick0=1, dtick=1),
-        showlegend=False,
-        height=400
-    )
-    
-    return fig
+@st.cache_resource
+def get_figure_cache():
+    """Process-wide cache of Analytics figures, shared by all sessions"""
+    return FigureCache(max_entries=64)
 
-def create_activity_chart():
-    """Create activity frequency chart"""
-    if not st.session_state.mood_data:
-        return None
-    
-    all_activities = []
-    for entry in st.session_state.mood_data:
-        all_activities.extend(entry['activities'])
-    
-    if not all_activities:
-        return None
-    
-    activity_counts = pd.Series(all_activities).value_counts()
-    
-    fig = px.bar(x=activity_counts.values, y=activity_counts.index, 
-                 orientation='h',
-                 title='Most Frequent Activities',
-                 labels={'x': 'Frequency', 'y': 'Activities'})
-    
-    fig.update_layout(height=400)
-    return fig
+@st.cache_resource
+def get_analytics_worker():
+    """Process-wide pool that precomputes Analytics figures after saves"""
+    return AnalyticsWorker(max_workers=2)
+
+def schedule_analytics_refresh():
+    """Precompute the current Analytics view for the latest mood data in the background"""
+    store = st.session_state.mood_store
+    if not store:
+        return
+    period = st.session_state.get('analytics_period', next(iter(ANALYTICS_PERIODS)))
+    resolution = st.session_state.get('analytics_resolution', "Auto")
+    start, end = period_range(period)
+    key = (store.token, store.version, start, end, resolution)
+    # Snapshot the rows and forecast now; the store keeps changing on this thread
+    rows = store.snapshot(store.date_span(start, end))
+    forecast = store.forecast.snapshot()
+    cache = get_figure_cache()
+
+    def refresh():
+        # Imported here so plotly loads on the worker, not on the first save
+        from mood_charts import build_figures
+        cache.put(key, build_figures(rows.frame(), forecast, resolution))
+
+    get_analytics_worker().submit(store.token, refresh)
+
+def analytics_figures(start, end, resolution="Auto"):
+    """Return the Analytics figures for a date range, rebuilt only when mood data changes
+
+    Built from the session's mood store, like the background refresh and
+    the rest of the page, so a cache key always holds the same data.
+    """
+    from mood_charts import build_figures
+    store = st.session_state.mood_store
+    cache = get_figure_cache()
+    key = (store.token, store.version, start, end, resolution)
+    figures = cache.get(key)
+    if figures is None and get_analytics_worker().wait(store.token, ANALYTICS_WAIT_SECONDS):
+        figures = cache.get(key)
+    if figures is None:
+        figures = build_figures(store.snapshot(store.date_span(start, end)).frame(), store.forecast, resolution)
+        cache.put(key, figures)
+    return figures
+
+def flush_writes():
+    """Wait for this session's queued writes, keeping any failure to show on the next run"""
+    try:
+        st.session_state.backend.flush()
+    except WriteError as error:
+        st.session_state.write_error = str(error)
 
 def main():
     # Title and header
     st.title("🌈 Mood & Wellness Tracker")
     st.markdown("*Track your daily mood, activities, and wellness journey*")
+    if 'write_error' in st.session_state:
+        st.error(f"⚠️ {st.session_state.pop('write_error')}")
     
     # Sidebar for navigation
     with st.sidebar:
@@ -331,14 +264,18 @@ def main():
         
         st.markdown("---")
         st.markdown("### Quick Stats")
-        if st.session_state.mood_data:
-            df = pd.DataFrame(st.session_state.mood_data)
-            st.metric("Total Entries", len(df))
-            st.metric("Average Mood", f"{df['mood_value'].mean():.1f}/5")
-            st.metric("Days Tracked", df['date'].nunique())
+        if st.session_state.mood_store:
+            stats = st.session_state.mood_store.stats
+            st.metric("Total Entries", stats.count)
+            st.metric("Average Mood", f"{stats.mean:.1f}/5")
+            st.metric("Days Tracked", stats.days_tracked)
         
         if st.session_state.diary_entries:
             st.metric("Diary Entries", len(st.session_state.diary_entries))
+        if st.session_state.backend.user_id is None:
+            st.caption("Not signed in: your entries are kept for this session only. "
+                       "Sign in to save them, or on a single-user server set "
+                       "MOOD_TRACKER_DEFAULT_USER=1 to save every visitor's entries.")
     
     # Main content based on selected page
     if page == "📝 Daily Check-in":
@@ -468,33 +405,68 @@ def main():
         if st.session_state.diary_entries:
             st.subheader(f"Your Diary Entries ({len(st.session_state.diary_entries)})")
             
-            # Sort entries by date (newest first)
-            sorted_entries = sorted(st.session_state.diary_entries, 
-                                  key=lambda x: f"{x['date']} {x['time']}", reverse=True)
+            # Search
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                search_query = st.text_input("Search entries:", placeholder="Words to find, e.g. beach or happ*")
+            with col2:
+                search_moods = st.multiselect("Filter by mood:", 
+                                            [f"{emoji} {info['name']}" for emoji, info in MOODS.items()],
+                                            key="diary_mood_filter")
+            
+            searching = bool(search_query.strip() or search_moods)
+            if searching:
+                # The page picker sits below the results, so read its value first
+                moods = [mood.split()[0] for mood in search_moods]
+                results_page = st.session_state.get("diary_search_page", 1)
+                offset = (results_page - 1) * DIARY_SEARCH_PAGE_SIZE
+                sorted_entries, total = st.session_state.diary_index.search(
+                    search_query, moods=moods, limit=DIARY_SEARCH_PAGE_SIZE, offset=offset)
+                page_count = max(1, -(-total // DIARY_SEARCH_PAGE_SIZE))
+                if results_page > page_count:
+                    # A narrower search left the old page past the end
+                    results_page = st.session_state.diary_search_page = page_count
+                    offset = (results_page - 1) * DIARY_SEARCH_PAGE_SIZE
+                    sorted_entries, total = st.session_state.diary_index.search(
+                        search_query, moods=moods, limit=DIARY_SEARCH_PAGE_SIZE, offset=offset)
+                if page_count > 1:
+                    st.caption(f"Showing {offset + 1}-{offset + len(sorted_entries)} of {total} matching entries")
+                else:
+                    st.caption(f"{total} matching entries")
+            else:
+                # Entries are kept in date order, newest first
+                sorted_entries = st.session_state.diary_entries
             
-            for i, entry in enumerate(sorted_entries):
-                with st.expander(f"📝 {entry['title']} - {entry['date']}"):
+            for entry in sorted_entries:
+                with st.expander(f"📝 {entry.title} - {entry.date}"):
                     col1, col2, col3 = st.columns([2, 1, 1])
                     
                     with col1:
-                        st.write(f"**Date:** {entry['date']}")
-                        st.write(f"**Time:** {entry['time']}")
+                        st.write(f"**Date:** {entry.date}")
+                        st.write(f"**Time:** {entry.time}")
                     
                     with col2:   
-                        if entry['mood']:
-                            st.write(f"**Mood:** {entry['mood']} {MOODS[entry['mood']]['name']}")
+                        if entry.mood:
+                            st.write(f"**Mood:** {entry.mood} {MOODS[entry.mood]['name']}")
                     
                     with col3:
-                        st.write(f"**Words:** {entry['word_count']}")
+                        st.write(f"**Words:** {entry.word_count}")
                     
-                    st.markdown("**Content:**")
-                    st.write(entry['content'])
+                    # Bodies are stored compressed; decompress only search hits
+                    # and entries the reader asks to see
+                    if searching or st.toggle("Show entry", key=f"show_diary_{entry.id}"):
+                        st.markdown("**Content:**")
+                        st.write(entry.content)
                     
                     # Delete button
-                    if st.button(f"🗑️ Delete Entry", key=f"delete_diary_{i}"):
-                        st.session_state.diary_entries.remove(entry)
+                    if st.button(f"🗑️ Delete Entry", key=f"delete_diary_{entry.id}"):
+                        delete_diary_entry(entry.id)
                         st.success("Entry deleted!")
                         st.rerun()
+
+            if searching and page_count > 1:
+                st.number_input(f"Results page (of {page_count}):", min_value=1, max_value=page_count,
+                                key="diary_search_page")
         else:
             st.info("No diary entries yet. Start writing your first entry above!")
     
@@ -573,10 +545,19 @@ def main():
     elif page == "📊 Analytics":
         st.header("Your Mood Analytics")
         
-        if not st.session_state.mood_data:
+        if not st.session_state.mood_store:
             st.warning("No data available yet. Start by logging your daily mood!")
             return
         
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            period = st.selectbox("Time period:", list(ANALYTICS_PERIODS.keys()), key="analytics_period")
+        with col2:
+            resolution = st.selectbox("Trend resolution:", ["Auto"] + list(RESOLUTIONS.keys()),
+                                      key="analytics_resolution")
+        start, end = period_range(period)
+        figures = analytics_figures(start, end, resolution)
+        
         # Insights
         col1, col2 = st.columns([1, 1])
         
@@ -586,35 +567,59 @@ def main():
         
         with col2:
             st.subheader("Mood Distribution")
-            df = pd.DataFrame(st.session_state.mood_data)
-            mood_counts = df['mood'].value_counts()
-            
-            fig_pie = px.pie(values=mood_counts.values, names=[MOODS[m]['name'] for m in mood_counts.index],
-                            title="Mood Distribution")
-            st.plotly_chart(fig_pie, use_container_width=True)
+            if figures['pie']:
+                st.plotly_chart(figures['pie'], use_container_width=True)
+            else:
+                st.info("No entries in this time period.")
         
         # Charts
         st.subheader("Mood Trend")
-        mood_chart = create_mood_chart()
-        if mood_chart:
-            st.plotly_chart(mood_chart, use_container_width=True)
+        if figures['trend']:
+            st.plotly_chart(figures['trend'], use_container_width=True)
         
         col3, col4 = st.columns(2)
         
         with col3:
-            activity_chart = create_activity_chart()
-            if activity_chart:
-                st.plotly_chart(activity_chart, use_container_width=True)
+            if figures['activities']:
+                st.plotly_chart(figures['activities'], use_container_width=True)
         
         with col4:
             st.subheader("Energy vs Sleep Analysis")
-            df = pd.DataFrame(st.session_state.mood_data)
-            if len(df) > 0:
-                fig_scatter = px.scatter(df, x='sleep_hours', y='energy_level', 
-                                       color='mood_value', 
-                                       title='Sleep vs Energy Levels',
-                                       labels={'sleep_hours': 'Hours of Sleep', 'energy_level': 'Energy Level'})
-                st.plotly_chart(fig_scatter, use_container_width=True)
+            if figures['scatter']:
+                st.plotly_chart(figures['scatter'], use_container_width=True)
+        
+        if figures['pairs']:
+            st.plotly_chart(figures['pairs'], use_container_width=True)
+        
+        # Activity insights (all time, from incrementally maintained sums)
+        st.subheader("Which Activities Go With Better Moods?")
+        lift = st.session_state.mood_store.activity_stats.lift()
+        total = st.session_state.mood_store.activity_stats.count
+        lift = lift[(lift['entries'] >= 3) & (lift['entries'] <= total - 3)]
+        if lift.empty:
+            st.info("Log a few more entries with and without each activity to see its effect on your mood.")
+        else:
+            col5, col6 = st.columns([1, 1])
+            with col5:
+                from mood_charts import create_activity_lift_chart
+                st.plotly_chart(create_activity_lift_chart(lift), use_container_width=True)
+            with col6:
+                st.dataframe(
+                    lift[['entries', 'mood_lift', 'ci_low', 'ci_high', 'next_day_lift',
+                          'energy_lift', 'sleep_lift']].sort_values('mood_lift', ascending=False).round(2),
+                    column_config={
+                        'entries': 'Entries',
+                        'mood_lift': 'Mood Lift',
+                        'ci_low': 'CI Low',
+                        'ci_high': 'CI High',
+                        'next_day_lift': 'Next-Day Mood Lift',
+                        'energy_lift': 'Energy Lift',
+                        'sleep_lift': 'Sleep Lift'
+                    },
+                    use_container_width=True
+                )
+                st.caption("Lift compares your average on entries with the activity to entries without it. "
+                           "Next-day lift compares the mood on the following day.")
     
     elif page == "💡 Wellness Tips":
         st.header("Wellness Tips & Resources")
@@ -698,40 +703,57 @@ def main():
     else:  # History
         st.header("Your Mood History")
         
-        if not st.session_state.mood_data:
+        with st.expander("📥 Import Mood Data"):
+            st.write("Upload a CSV, JSON or Parquet file, such as one exported from this page.")
+            uploaded = st.file_uploader("Mood data file:", type=IMPORT_TYPES)
+            if uploaded is not None and st.button("Import Entries", key="import_button"):
+                try:
+                    imported_df, problems = validate_moods(read_upload(uploaded.name, uploaded.getvalue()),
+                                                           MOODS, ACTIVITIES)
+                except (ValueError, json.JSONDecodeError) as error:
+                    st.error(f"Could not read {uploaded.name}: {error}")
+                else:
+                    for problem in problems:
+                        st.warning(f"Skipped {problem}")
+                    if len(imported_df):
+                        import_mood_entries(imported_df)
+                        st.success(f"✅ Imported {len(imported_df)} entries!")
+        
+        if not st.session_state.mood_store:
             st.warning("No mood entries yet. Start tracking to see your history!")
             return
         
-        df = pd.DataFrame(st.session_state.mood_data)
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date', ascending=False)
-        
         # Filters
-        col1, col2 = st.columns(2)
+        col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
         with col1:
-            date_filter = st.date_input("Filter by date (optional):")
+            date_filter = st.date_input("Filter by date range (optional):", value=())
         with col2:
             mood_filter = st.multiselect("Filter by mood:", 
                                        [f"{emoji} {info['name']}" for emoji, info in MOODS.items()])
-        
-        # Apply filters
-        filtered_df = df.copy()
-        if date_filter:
-            filtered_df = filtered_df[filtered_df['date'].dt.date == date_filter]
-        
-        if mood_filter:
-            mood_emojis = [mood.split()[0] for mood in mood_filter]
-            filtered_df = filtered_df[filtered_df['mood'].isin(mood_emojis)]
+        with col3:
+            activity_filter = st.multiselect("Filter by activity:", ACTIVITIES)
+        with col4:
+            page_size = st.selectbox("Entries per page:", HISTORY_PAGE_SIZES, index=1)
+        
+        # Apply filters, fetching only the rows on the current page
+        mood_emojis = [mood.split()[0] for mood in mood_filter]
+        start = date_filter[0] if date_filter else None
+        end = date_filter[-1] if date_filter else None
+        total = count_moods(start=start, end=end, moods=mood_emojis, activities=activity_filter)
+        page_count = max(1, -(-total // page_size))
+        page = st.number_input(f"Page (of {page_count}):", min_value=1, max_value=page_count, value=1)
+        page_df = query_moods(start=start, end=end, moods=mood_emojis, activities=activity_filter,
+                              limit=page_size, offset=(page - 1) * page_size, newest_first=True)
         
         # Display entries
-        st.subheader(f"Showing {len(filtered_df)} entries")
+        st.subheader(f"Showing {len(page_df)} of {total} entries")
         
-        for idx, row in filtered_df.iterrows():
+        for idx, row in page_df.iterrows():
             with st.expander(f"{row['date'].strftime('%B %d, %Y')} - {row['mood']} {MOODS[row['mood']]['name']}"):
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    st.write(f"**Time:** {row['time']}")
+                    st.write(f"**Time:** {row['date'].strftime('%H:%M')}")
                     st.write(f"**Mood:** {row['mood']} {MOODS[row['mood']]['name']}")
                 
                 with col2:
@@ -741,21 +763,35 @@ def main():
                 with col3:
                     if row['activities']:
                         st.write("**Activities:**")
-                        for activity in row['activities']:
+                        for activity in decode_activities(row['activities']):
                             st.write(f"• {activity}")
                 
                 if row['notes']:
                     st.write(f"**Notes:** {row['notes']}")
+                
+                # Delete button
+                if st.button("🗑️ Delete Entry", key=f"delete_mood_{row['id']}"):
+                    delete_mood_entry(row['id'])
+                    st.success("Entry deleted!")
+                    st.rerun()
         
-        # Export data
-        if st.button("Export Data as CSV"):
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name=f"mood_data_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
+        # Export data (all pages matching the filters)
+        export_format = st.radio("Export format:", list(EXPORT_FORMATS.keys()), horizontal=True)
+        extension, mime = EXPORT_FORMATS[export_format]
+        backend = st.session_state.backend
+        # The file is built only when the download is clicked, on Streamlit's
+        # download thread, so it must not touch session state
+        st.download_button(
+            label=f"Download {export_format}",
+            data=lambda: export_moods(backend.iter_moods(start=start, end=end, moods=mood_emojis,
+                                                         activities=activity_filter), export_format),
+            file_name=f"mood_data_{datetime.now().strftime('%Y%m%d')}.{extension}",
+            mime=mime
+        )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        # Wait for this run's queued writes, including on st.rerun()
+        flush_writes()
\ No newline at end of file
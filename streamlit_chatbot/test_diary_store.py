@@ -0,0 +1,56 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from diary_store import OVERFLOW_SPILL_BYTES, DiaryEntry, DiarySearchIndex, DiaryStore
+
+WORDS = [f'word{i}' for i in range(2000)]
+
+
+def make_entries(count, order='sorted', seed=0):
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        hour = {'sorted': i, 'reverse': count - i, 'random': rng.randrange(count)}[order]
+        body = ' '.join(rng.choices(WORDS, k=200))
+        entries.append(DiaryEntry(i + 1, datetime(2020, 1, 1) + timedelta(hours=hour), f'Day {i}', body, None))
+    return entries
+
+
+@pytest.mark.parametrize('order', ['sorted', 'reverse', 'random'])
+def test_spilled_bodies_read_back_and_stay_within_limit(tmp_path, order):
+    entries = make_entries(3000, order)
+    bodies = {entry.id: entry.content for entry in entries}
+    # Room for the entries and index of every entry, and a quarter of the bodies
+    unlimited = DiaryStore(make_entries(3000, order), search_index=DiarySearchIndex())
+    resident = unlimited.resident_bytes()
+    limit = resident + (unlimited.memory_usage() - resident) // 4
+    store = DiaryStore(memory_limit=limit, segment_dir=str(tmp_path), search_index=DiarySearchIndex())
+    for entry in entries:
+        store.add(entry)
+        assert store.memory_usage() <= limit
+    assert not store.over_limit
+    assert store._blob is not None
+
+    rng = random.Random(1)
+    for entry_id in rng.sample(sorted(bodies), 500):
+        store.remove(entry_id)
+        del bodies[entry_id]
+    for entry in make_entries(3500, order, seed=2)[3000:]:
+        store.add(entry)
+        bodies[entry.id] = entry.content
+    assert {entry.id: entry.content for entry in store} == bodies
+    assert store.memory_usage() <= limit
+    keys = [(entry.minute, entry.id) for entry in store]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_overflow_spills_in_batches(tmp_path):
+    store = DiaryStore(memory_limit=100_000, segment_dir=str(tmp_path), search_index=DiarySearchIndex())
+    entries = make_entries(1000)
+    for entry in entries:
+        store.add(entry)
+        assert store._content_bytes < OVERFLOW_SPILL_BYTES
+    assert store.over_limit
+    assert [entry.content for entry in store] == [entry.content for entry in reversed(entries)]
@@ -0,0 +1,185 @@
+import logging
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mood_store import MOODS, MoodForecast, MoodStore
+
+MOOD_LIST = list(MOODS)
+MOOD_VALUES = np.array([MOODS[mood]['value'] for mood in MOOD_LIST], dtype=np.int8)
+
+
+def make_frame(count, seed=0, first_id=1):
+    """Random entries in date order, about a dozen per day"""
+    rng = np.random.default_rng(seed)
+    seconds = np.sort(rng.integers(0, (count // 12 + 1) * 86400, count)).astype('timedelta64[s]')
+    moods = rng.integers(0, len(MOOD_LIST), count)
+    return pd.DataFrame({
+        'id': np.arange(first_id, first_id + count),
+        'date': (np.datetime64('2020-01-01') + seconds).astype('datetime64[ns]'),
+        'mood': pd.Categorical.from_codes(moods, categories=MOOD_LIST),
+        'mood_value': MOOD_VALUES[moods],
+        'activities': rng.integers(0, 1 << 15, count).astype(np.uint16),
+        'notes': [f'note {i}' for i in range(first_id, first_id + count)],
+        'energy_level': rng.integers(1, 11, count).astype(np.int8),
+        'sleep_hours': rng.uniform(4, 10, count).astype(np.float32),
+    })
+
+
+def entry_of(df, position, entry_id):
+    entry = df.iloc[position].to_dict()
+    entry['id'] = entry_id
+    return entry
+
+
+def run_ops(stores, seed=0, count=300):
+    """Apply the same random appends, back-dated appends, bulk appends and deletes to each store"""
+    df = make_frame(count * 20, seed=seed + 1)
+    rng = random.Random(seed)
+    next_id = 10 ** 6
+    for i in range(count):
+        op = rng.random()
+        if op < 0.4:
+            entries = [entry_of(df, len(df) // 2 + i, next_id)]
+        elif op < 0.5:
+            entries = [entry_of(df, rng.randrange(len(df) // 2), next_id)]
+        elif op < 0.6:
+            chunk = df.iloc[rng.randrange(len(df) - 20):][:20].copy()
+            chunk['id'] = np.arange(next_id, next_id + len(chunk))
+            entries = chunk
+        else:
+            position = rng.random()
+            for store in stores:
+                store.delete(int(position * len(store)))
+            continue
+        next_id += 20
+        for store in stores:
+            if isinstance(entries, pd.DataFrame):
+                store.extend(entries.copy())
+            else:
+                store.append(dict(entries[0]))
+
+
+def summary(store):
+    stats = store.stats
+    return {
+        'len': len(store),
+        'stats': (stats.count, stats.total, stats.mood_counts, stats.days_tracked, list(stats.recent),
+                  stats.most_common_mood),
+        'lift': store.activity_stats.lift().round(9).fillna(-1).to_dict(),
+        'moods': store.select(moods=MOOD_LIST[:2]).tolist(),
+        'range': store.select(start='2020-03-01', end='2020-06-30', moods=MOOD_LIST[2:3]).tolist(),
+        'activities': store.select(activities=['Music']).tolist(),
+        'frame': store.take(store.select()),
+    }
+
+
+def assert_same(left, right):
+    left, right = summary(left), summary(right)
+    pd.testing.assert_frame_equal(left.pop('frame'), right.pop('frame'))
+    assert left == right
+
+
+def test_spilled_store_matches_in_memory_store(tmp_path):
+    tiered = MoodStore(memory_limit=200_000, segment_dir=str(tmp_path))
+    plain = MoodStore()
+    initial = make_frame(15_000)
+    for store in (tiered, plain):
+        store.extend(initial.copy())
+    run_ops([tiered, plain])
+    assert tiered.cold_rows > 0
+    assert_same(tiered, plain)
+    entry_id = int(plain.take([len(plain) // 3])['id'].iloc[0])
+    assert tiered.row_of(entry_id) == plain.row_of(entry_id)
+
+
+def test_memory_usage_stays_within_limit(tmp_path):
+    limit = 2 * 2 ** 20
+    store = MoodStore(memory_limit=limit, segment_dir=str(tmp_path))
+    df = make_frame(60_000)
+    for start in range(0, len(df), 5_000):
+        store.extend(df.iloc[start:start + 5_000].copy())
+        assert store.memory_usage() <= limit
+    assert not store.over_limit
+    assert store.cold_rows > 0
+
+
+def test_resident_overflow_is_reported_and_spills_in_batches(tmp_path, caplog):
+    store = MoodStore(memory_limit=50_000, segment_dir=str(tmp_path))
+    with caplog.at_level(logging.WARNING, logger='mood_store'):
+        store.extend(make_frame(5_000))
+    assert store.over_limit
+    assert any('session limit' in record.message for record in caplog.records)
+    plain = MoodStore()
+    plain.extend(make_frame(5_000))
+    assert_same(store, plain)
+
+
+def replayed_forecast(store):
+    """A forecast fed every stored entry one at a time, in date order"""
+    frame = store.take(store.select())
+    forecast = MoodForecast()
+    for day, value in zip(frame['date'], frame['mood_value']):
+        forecast.add(day, value)
+    return forecast
+
+
+def assert_same_forecast(left, right):
+    assert np.allclose(left.current(), right.current(), rtol=0, atol=1e-9)
+    assert left.predict() == pytest.approx(right.predict(), abs=1e-9)
+    (left_days, left_levels), (right_days, right_levels) = zip(*left.series()), zip(*right.series())
+    assert list(left_days) == list(right_days)
+    assert np.allclose(left_levels, right_levels, rtol=0, atol=1e-9)
+
+
+def test_forecast_matches_per_entry_replay(tmp_path):
+    tiered = MoodStore(memory_limit=200_000, segment_dir=str(tmp_path))
+    plain = MoodStore()
+    for store in (tiered, plain):
+        store.extend(make_frame(5_000))
+    run_ops([tiered, plain], seed=3)
+    for store in (tiered, plain):
+        assert_same_forecast(store.forecast, replayed_forecast(store))
+
+
+def test_add_days_matches_add():
+    df = make_frame(2_000, seed=5)
+    by_entry, by_day = MoodForecast(), MoodForecast()
+    for day, value in zip(df['date'], df['mood_value']):
+        by_entry.add(day, value)
+    days = df['date'].to_numpy().astype('datetime64[D]')
+    for part in np.array_split(np.arange(len(df)), 7):
+        unique, starts = np.unique(days[part], return_index=True)
+        sums = np.add.reduceat(df['mood_value'].to_numpy()[part].astype(float), starts)
+        assert by_day.add_days(unique, sums, np.diff(np.append(starts, len(part))))
+    assert_same_forecast(by_day, by_entry)
+    assert not by_day.add_days([days[0]], [3.0], [1])
+
+
+def test_rolling_mean_covers_calendar_days():
+    forecast = MoodForecast(window=7)
+    for day, value in [('2024-01-01', 5), ('2024-01-02', 5), ('2024-01-05', 3), ('2024-01-20', 1)]:
+        forecast.add(day, value)
+    # Every earlier day is more than a week before the 20th
+    assert forecast.current()[3] == 1.0
+    forecast.add('2024-01-24', 3)
+    assert forecast.current()[3] == 2.0
+    assert forecast.snapshot().current() == forecast.current()
+
+
+@pytest.mark.parametrize('memory_limit', [200_000, None])
+def test_snapshot_is_unchanged_by_later_writes(tmp_path, memory_limit):
+    store = MoodStore(memory_limit=memory_limit, segment_dir=str(tmp_path))
+    store.extend(make_frame(15_000))
+    rows = store.date_span('2020-02-01', '2020-11-30')
+    snapshot = store.snapshot(rows)
+    expected = store.take(rows).drop(columns='notes')
+    # Deletes in both tiers, appends and further spills after the snapshot
+    for row in (5, len(store) // 2, len(store) - 3):
+        store.delete(row)
+    store.extend(make_frame(5_000, seed=9, first_id=10 ** 6))
+    run_ops([store], seed=4, count=100)
+    assert len(snapshot) == len(rows)
+    pd.testing.assert_frame_equal(snapshot.frame(), expected)
@@ -0,0 +1,252 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Theme dictionaries: one <theme>.txt per theme, one word per line
+WORDS_DIR = os.environ.get(
+    "CROSSWORD_WORDS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "words")
+)
+# Binary indexes built from the dictionaries, memory-mapped when used
+INDEX_DIR = os.environ.get(
+    "CROSSWORD_INDEX_DIR",
+    os.path.join(tempfile.gettempdir(), "crossword_index")
+)
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+MIN_WORD_LENGTH = 2
+MAX_WORD_LENGTH = 15
+# Random draws tried before scanning a candidate slice for multi-letter patterns
+SAMPLE_TRIES = 32
+# Letter code used past the end of a word
+PAD = 26
+
+
+def default_difficulty(word):
+    """Difficulty index for a word listed without one: short words are easy"""
+    if len(word) <= 4:
+        return 0
+    return 1 if len(word) <= 7 else 2
+
+
+def read_dictionary(path):
+    """Parse a theme file into (words, difficulty indexes)
+
+    Each line holds a word, optionally followed by a difficulty name.
+    Anything but A-Z is dropped from words ("New Zealand" -> NEWZEALAND),
+    and duplicates keep their first listing.
+    """
+    seen = {}
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            parts = line.replace(',', ' ').split()
+            if not parts or parts[0].startswith('#'):
+                continue
+            level = None
+            if len(parts) > 1 and parts[-1].capitalize() in DIFFICULTIES:
+                level = DIFFICULTIES.index(parts.pop().capitalize())
+            word = ''.join(ch for ch in ''.join(parts).upper() if 'A' <= ch <= 'Z')
+            if MIN_WORD_LENGTH <= len(word) <= MAX_WORD_LENGTH and word not in seen:
+                seen[word] = default_difficulty(word) if level is None else level
+    return list(seen), list(seen.values())
+
+
+def build_index(path, directory):
+    """Write the binary index for one theme file into `directory`
+
+    words.npy      fixed-width words sorted by (difficulty, length, word)
+    groups.npy     [difficulty, length] -> (first, end) word ids
+    positions.npy  per (difficulty, length, position), the group's word ids
+                   ordered by the letter at that position
+    letters.npy    [difficulty, length, position, letter] -> offset into
+                   positions.npy where that letter's ids start (27 entries,
+                   so letter c spans [c, c + 1))
+    """
+    words, levels = read_dictionary(path)
+    width = max(map(len, words), default=1)
+    words = np.array(words, dtype=f'S{width}')
+    levels = np.array(levels, dtype=np.int64)
+    lengths = np.char.str_len(words).astype(np.int64)
+    order = np.lexsort((words, lengths, levels))
+    words, levels, lengths = words[order], levels[order], lengths[order]
+    codes = np.frombuffer(words.tobytes(), dtype=np.uint8).reshape(len(words), width).astype(np.int64) - ord('A')
+    codes[codes < 0] = PAD
+
+    keys = levels * (MAX_WORD_LENGTH + 1) + lengths
+    bounds = np.searchsorted(keys, np.arange(len(DIFFICULTIES) * (MAX_WORD_LENGTH + 1) + 1))
+    groups = np.stack([bounds[:-1], bounds[1:]], axis=1).reshape(len(DIFFICULTIES), MAX_WORD_LENGTH + 1, 2)
+    positions = []
+    letters = np.zeros((len(DIFFICULTIES), MAX_WORD_LENGTH + 1, MAX_WORD_LENGTH, PAD + 1), dtype=np.int64)
+    offset = 0
+    for level in range(len(DIFFICULTIES)):
+        for length in range(MIN_WORD_LENGTH, MAX_WORD_LENGTH + 1):
+            first, end = groups[level, length]
+            if end == first:
+                # Empty groups keep all-zero bounds, i.e. empty slices
+                continue
+            for position in range(length):
+                column = codes[first:end, position]
+                ids = np.argsort(column, kind='stable')
+                positions.append((ids + first).astype(np.int32))
+                letters[level, length, position] = offset + np.searchsorted(column[ids], np.arange(PAD + 1))
+                offset += end - first
+
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    temp = tempfile.mkdtemp(dir=os.path.dirname(directory))
+    np.save(os.path.join(temp, 'words.npy'), words)
+    np.save(os.path.join(temp, 'groups.npy'), groups)
+    np.save(os.path.join(temp, 'positions.npy'),
+            np.concatenate(positions) if positions else np.empty(0, dtype=np.int32))
+    np.save(os.path.join(temp, 'letters.npy'), letters)
+    stat = os.stat(path)
+    with open(os.path.join(temp, 'source.json'), 'w') as handle:
+        json.dump({'mtime': stat.st_mtime, 'size': stat.st_size}, handle)
+    # Swap the finished index in whole, so readers never see a partial one
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(temp, directory)
+
+
+def _index_is_current(path, directory):
+    try:
+        with open(os.path.join(directory, 'source.json')) as handle:
+            source = json.load(handle)
+    except (OSError, ValueError):
+        return False
+    stat = os.stat(path)
+    return source == {'mtime': stat.st_mtime, 'size': stat.st_size}
+
+
+class ThemeWords:
+    """Memory-mapped index over one theme's words
+
+    Words are grouped by difficulty and length, and within each group
+    ordered by the letter at every position, so each single constraint is
+    one contiguous slice and drawing a word from it is O(1). Only the
+    small bounds tables are read into memory; the word list and position
+    orderings stay on disk and are paged in as they are touched.
+    """
+
+    def __init__(self, directory):
+        self.words = np.load(os.path.join(directory, 'words.npy'), mmap_mode='r')
+        self.positions = np.load(os.path.join(directory, 'positions.npy'), mmap_mode='r')
+        self.groups = np.load(os.path.join(directory, 'groups.npy'))
+        self.letters = np.load(os.path.join(directory, 'letters.npy'))
+        self._codes = None
+
+    def __len__(self):
+        return len(self.words)
+
+    def word(self, word_id):
+        return self.words[word_id].decode('ascii')
+
+    def count(self, difficulty, length=None):
+        """Number of words at a difficulty, optionally of one length"""
+        spans = self.groups[DIFFICULTIES.index(difficulty)]
+        if length is not None:
+            return int(spans[length, 1] - spans[length, 0])
+        return int(spans[-1, 1] - spans[0, 0])
+
+    def lengths(self, difficulty):
+        """Word lengths available at a difficulty"""
+        spans = self.groups[DIFFICULTIES.index(difficulty)]
+        return [length for length in range(MAX_WORD_LENGTH + 1) if spans[length, 1] > spans[length, 0]]
+
+    def codes(self, word_ids):
+        """Letter codes (0-25, PAD past the end) for the given words"""
+        if self._codes is None:
+            width = self.words.dtype.itemsize
+            self._codes = self.words.view(np.uint8).reshape(len(self.words), width)
+        codes = self._codes[word_ids].astype(np.int64) - ord('A')
+        codes[codes < 0] = PAD
+        return codes
+
+    def candidates(self, difficulty, length, pattern=None):
+        """Return the ids of words matching a length and {position: letter} pattern"""
+        level = DIFFICULTIES.index(difficulty)
+        first, end = self.groups[level, length]
+        if not pattern:
+            return np.arange(first, end)
+        spans = self._spans(level, length, pattern)
+        start, stop = min(spans, key=lambda span: span[1] - span[0])
+        ids = np.asarray(self.positions[start:stop])
+        if len(pattern) > 1 and len(ids):
+            codes = self.codes(ids)
+            keep = np.ones(len(ids), dtype=bool)
+            for position, letter in pattern.items():
+                keep &= codes[:, position] == ord(letter) - ord('A')
+            ids = ids[keep]
+        return ids
+
+    def _spans(self, level, length, pattern):
+        spans = []
+        for position, letter in pattern.items():
+            code = ord(letter.upper()) - ord('A')
+            table = self.letters[level, length, position]
+            spans.append((table[code], table[code + 1]))
+        return spans
+
+    def sample(self, difficulty, length=None, pattern=None, rng=random):
+        """Draw a random word at a difficulty, optionally of a length and letter pattern
+
+        `pattern` maps positions to letters and needs `length`. Returns
+        None when nothing matches.
+        """
+        level = DIFFICULTIES.index(difficulty)
+        if length is None:
+            first, end = self.groups[level, 0, 0], self.groups[level, -1, 1]
+            return self.word(rng.randrange(first, end)) if end > first else None
+        if not pattern:
+            first, end = self.groups[level, length]
+            return self.word(rng.randrange(first, end)) if end > first else None
+        start, stop = min(self._spans(level, length, pattern), key=lambda span: span[1] - span[0])
+        if stop == start:
+            return None
+        wanted = {position: letter.upper() for position, letter in pattern.items()}
+        for _ in range(SAMPLE_TRIES):
+            word = self.word(self.positions[rng.randrange(start, stop)])
+            if all(word[position] == letter for position, letter in wanted.items()):
+                return word
+        ids = self.candidates(difficulty, length, wanted)
+        return self.word(ids[rng.randrange(len(ids))]) if len(ids) else None
+
+
+class WordStore:
+    """Theme word lists, indexed and memory-mapped on first use
+
+    Themes are the `.txt` files in `directory`. The first time a theme is
+    used its index is built (or reused from INDEX_DIR if the file has not
+    changed since), and at most `max_loaded` themes stay mapped at once.
+    """
+
+    def __init__(self, directory=WORDS_DIR, index_dir=INDEX_DIR, max_loaded=4):
+        self.directory = directory
+        self.index_dir = index_dir
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def themes(self):
+        """Theme names, from the dictionary file names"""
+        names = [name[:-4] for name in os.listdir(self.directory) if name.endswith('.txt')]
+        return sorted(name.replace('_', ' ').title() for name in names)
+
+    def theme(self, name):
+        """Return the ThemeWords for a theme, building its index if needed"""
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                return self._loaded[name]
+            stem = name.lower().replace(' ', '_')
+            path = os.path.join(self.directory, f'{stem}.txt')
+            index = os.path.join(self.index_dir, stem)
+            if not _index_is_current(path, index):
+                build_index(path, index)
+            words = self._loaded[name] = ThemeWords(index)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+            return words